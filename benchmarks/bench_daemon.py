@@ -0,0 +1,96 @@
+"""
+Per-command latency of the CLI, with and without `note daemon`.
+
+    python benchmarks/bench_daemon.py --notes 2000 --repeat 10
+
+It creates a temporary notes.json with N notes, then runs `python -m note list/show/search`
+as new processes(like a shell loop does) first with `--no-daemon` and then against a running daemon.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from note.models import Note  # noqa: E402
+
+
+def make_notes(db_path: Path, count: int) -> Note:
+    """Writes `count` notes to db_path and returns one of them."""
+    notes = [
+        Note(title=f"Note {i}", content=f"Content of note number {i}.\n" * 20, tags=[f"tag{i % 10}"])
+        for i in range(count)
+    ]
+    db_path.write_text(json.dumps([note.model_dump(mode="json") for note in notes]))
+    return notes[count // 2]
+
+
+def run_command(args: list, cwd: Path, env: dict) -> float:
+    """Runs one CLI command in a new process and returns its wall time in milliseconds."""
+    start = time.perf_counter()
+    subprocess.run(  # noqa: S603 (our own interpreter and arguments)
+        [sys.executable, "-m", "note", *args], cwd=cwd, env=env, capture_output=True, check=True
+    )
+    return (time.perf_counter() - start) * 1000
+
+
+def wait_for_socket(socket_path: Path, timeout: float = 60.0) -> None:
+    """Waits until the daemon is listening."""
+    deadline = time.monotonic() + timeout
+    while not socket_path.exists():
+        if time.monotonic() > deadline:
+            msg = "Daemon did not start."
+            raise RuntimeError(msg)
+        time.sleep(0.05)
+
+
+def main() -> None:
+    """Runs the benchmark and prints a table of median latencies."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--notes", type=int, default=2000, help="Number of notes in notes.json.")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per command.")
+    options = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=str(REPO_ROOT), COLUMNS="200")
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = Path(tmp)
+        sample = make_notes(cwd / "notes.json", options.notes)
+        commands = {
+            "list": ["list"],
+            "show": ["show", str(sample.id)[:8]],
+            "search": ["search", sample.title],
+        }
+
+        results = {}
+        for name, args in commands.items():
+            results[name] = [
+                statistics.median(run_command(["--no-daemon", *args], cwd, env) for _ in range(options.repeat))
+            ]
+
+        daemon = subprocess.Popen(
+            [sys.executable, "-m", "note", "daemon"],
+            cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_for_socket(cwd / ".note-daemon.sock")
+            for name, args in commands.items():
+                results[name].append(statistics.median(run_command(args, cwd, env) for _ in range(options.repeat)))
+        finally:
+            daemon.terminate()
+            daemon.wait()
+
+    print(f"{options.notes} notes, median of {options.repeat} runs (ms)")  # noqa: T201
+    print(f"{'command':<10}{'no daemon':>12}{'daemon':>12}{'speedup':>10}")  # noqa: T201
+    for name, (direct, via_daemon) in results.items():
+        print(f"{name:<10}{direct:>12.1f}{via_daemon:>12.1f}{direct / via_daemon:>9.1f}x")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
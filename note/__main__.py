@@ -1,6 +1,7 @@
 import logging
 
-from note.cli import app
+from note.cli import app, console
+from note.exceptions import DaemonError, StorageError
 
 
 def setup_logging():
@@ -20,7 +21,11 @@ def setup_logging():
 def main():
     """Main function of Note program."""
     setup_logging()
-    app()
+    try:
+        app()
+    except (DaemonError, StorageError) as e: # e.g. the daemon was stopped in the middle of a write
+        console.print(f"Error: {e}", style="bold red")
+        raise SystemExit(1) from e
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,107 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from pathlib import Path
+from types import TracebackType
+from typing import Iterable, Optional, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024 # Files are copied 1MB at a time, never loaded completely in memory
+_DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BlobWriter:
+    """
+    Writes one blob chunk by chunk into a temp file and hashes it while writing.
+    On commit, the temp file is moved to its content-addressed path(or dropped if that blob already exists).
+    """
+
+    def __init__(self, store: "BlobStore") -> None:
+        self._store = store
+        self._hash = hashlib.sha256()
+        self._size = 0
+        store.tmp_path.mkdir(parents=True, exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(dir=store.tmp_path, delete=False)
+
+    def write(self, chunk: bytes) -> None:
+        """Appends a chunk to the blob."""
+        self._file.write(chunk)
+        self._hash.update(chunk)
+        self._size += len(chunk)
+
+    def commit(self) -> Tuple[str, int]:
+        """Finishes the blob and returns its SHA-256 digest and size."""
+        self._file.close()
+        digest = self._hash.hexdigest()
+        final_path = self._store.path_for(digest)
+        if final_path.exists(): # Same content is stored only once
+            os.unlink(self._file.name)
+            logger.info(f"Blob {digest} already exists.")
+        else:
+            final_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(self._file.name, final_path) # atomic, readers never see half-written blobs
+            logger.info(f"Blob {digest} stored ({self._size} bytes).")
+        return digest, self._size
+
+    def abort(self) -> None:
+        """Drops the half-written blob."""
+        self._file.close()
+        if os.path.exists(self._file.name):
+            os.unlink(self._file.name)
+
+    def __enter__(self) -> "BlobWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        if exc_type is not None:
+            self.abort()
+
+
+class BlobStore:
+    """
+    Content-addressed storage for attachments.
+    Each blob is saved once under its SHA-256 digest, sharded like `ab/cd/abcd...` to keep directories small.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self._root = root
+
+    @property
+    def tmp_path(self) -> Path:
+        """Directory of unfinished uploads(on the same filesystem, so moving them is atomic)."""
+        return self._root / "tmp"
+
+    def path_for(self, digest: str) -> Path:
+        """Returns path of a blob."""
+        if not _DIGEST_PATTERN.match(digest):
+            msg = f"Invalid blob digest '{digest}'."
+            raise ValueError(msg)
+        return self._root / digest[:2] / digest[2:4] / digest
+
+    def exists(self, digest: str) -> bool:
+        """Checks if a blob is stored."""
+        return self.path_for(digest).is_file()
+
+    def writer(self) -> BlobWriter:
+        """Returns a writer for a new blob."""
+        return BlobWriter(self)
+
+    def put_stream(self, chunks: Iterable[bytes]) -> Tuple[str, int]:
+        """Stores a blob from an iterable of chunks and returns its digest and size."""
+        with self.writer() as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+            return writer.commit()
+
+    def put_file(self, path: Path) -> Tuple[str, int]:
+        """Stores a file chunk by chunk and returns its digest and size."""
+        with path.open("rb") as f:
+            return self.put_stream(iter(lambda: f.read(CHUNK_SIZE), b""))
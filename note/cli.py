@@ -1,29 +1,110 @@
+import mimetypes
+from datetime import datetime
 from pathlib import Path
+from typing import List, Optional
 
 import typer
-import uvicorn
 from rich.console import Console
 from rich.panel import Panel
 from rich.table import Table
 from rich.text import Text
 
-from note.exceptions import NoteNotFoundError, NotUniqueIDError
+from note.blobs import BlobStore
+from note.daemon import DaemonNoteManager, NoteDaemon, daemon_supported
+from note.exceptions import DaemonError, NoteNotFoundError, NotUniqueIDError, SyncError
+from note.interfaces import INoteManager
+from note.models import Attachment
+from note.pool import list_notebooks, notebook_path
 from note.services import JsonNoteManager
-from note.web_app import create_app
+from note.sync import CONFLICT_POLICIES, open_peer, sync_stores
+from note.utils import format_size, parse_key_values
+from settings import settings
 
 app = typer.Typer(help="Personal Note Manager - A Simple Notebook!")
 
 console = Console()
 
 DB_PATH = Path("notes.json")
-manager = JsonNoteManager(DB_PATH)
-
+BLOBS_PATH = settings.BLOBS_PATH # attachments(the same directory as the web app, so it can serve them)
+NOTEBOOKS_PATH = settings.NOTEBOOKS_PATH # each notebook is a Json file in this directory(shared with web app)
+SOCKET_PATH = Path(".note-daemon.sock") # `note daemon` listens here
+
+# Chosen in choose_notebook(), before each command runs:
+store_path = DB_PATH # Json file of the current notebook
+notebook_name: Optional[str] = None # None means notes.json
+use_daemon = True
+_manager: Optional[INoteManager] = None # built by get_manager() on first use
+
+DATE_FORMATS = ["%Y-%m-%d", "%Y-%m-%dT%H:%M", "%Y-%m-%dT%H:%M:%S"] # accepted formats for --since/--until
+
+
+@app.callback()
+def choose_notebook(
+    notebook: Optional[str] = typer.Option(
+        None, "--notebook", "-n", envvar="NOTE_NOTEBOOK", help="Work on this notebook instead of notes.json."
+    ),
+    no_daemon: bool = typer.Option(  # noqa: FBT001
+        False, "--no-daemon", envvar="NOTE_NO_DAEMON", help="Read the Json file even if `note daemon` is running."
+    ),
+) -> None:
+    """Chooses the notebook which commands work on."""
+    global store_path, notebook_name, use_daemon  # noqa: PLW0603 (commands use the module-level choice)
+    if notebook is not None:
+        try:
+            store_path = notebook_path(NOTEBOOKS_PATH, notebook)
+        except ValueError as e:
+            console.print(f"Error: {e}", style="bold red")
+            raise typer.Exit(code=1) from e
+    notebook_name, use_daemon = notebook, not no_daemon
+
+def require_notebook(*, create: bool = False) -> None:
+    """Stops the command if the chosen notebook doesn't exist. Only writes(`create=True`) may start a new one."""
+    if notebook_name is not None and not create and not store_path.exists():
+        console.print(f"Error: Notebook '{notebook_name}' does not exist. See `note notebooks`.", style="bold red")
+        raise typer.Exit(code=1)
+
+def open_json_manager() -> JsonNoteManager:
+    """Opens the Json file of the chosen notebook."""
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+    return JsonNoteManager(store_path)
+
+def get_manager(*, create: bool = False) -> INoteManager:
+    """
+    Returns the manager of the chosen notebook. It is built on first use, so commands which don't need notes
+    (web, daemon, notebooks) don't load them. If `note daemon` is running we use it, because it already has notes,
+    indexes and caches in memory. If the daemon goes away during the command, the Json file is used instead.
+    """
+    global _manager  # noqa: PLW0603
+    require_notebook(create=create)
+    if _manager is None:
+        if use_daemon:
+            _manager = DaemonNoteManager.connect(SOCKET_PATH, notebook_name, fallback=open_json_manager)
+        _manager = _manager or open_json_manager()
+    return _manager
+
+@app.command(name="notebooks")
+def show_notebooks() -> None:
+    """List all notebooks."""
+    names = list_notebooks(NOTEBOOKS_PATH)
+    if not names:
+        console.print("No notebooks found. Create one with `note --notebook NAME create`.")
+        return
+    for name in names:
+        console.print(f"[bold blue]{name}[/bold blue]")
 
 @app.command()
 def create(
-    title: str = typer.Option(..., "--title", "-t", prompt="Enter note title")
+    title: str = typer.Option(..., "--title", "-t", prompt="Enter note title"),
+    tags: Optional[List[str]] = typer.Option(None, "--tag", "-g", help="Tag of note(can be repeated)."),  # noqa: B008
+    meta: Optional[List[str]] = typer.Option(None, "--meta", "-m", help="Metadata as key=value(can be repeated)."),  # noqa: B008
     ) -> None:
     """Create a new note interactively."""
+    try:
+        metadata = parse_key_values(meta)
+    except ValueError as e:
+        console.print(f"Error: [bold red]{e}[/bold red]")
+        return
+
     console.print("Enter note content. When you are done, save and close the editor.")
     # Open the default editor for multi-line content
     content = typer.edit()
@@ -32,7 +113,7 @@ def create(
         return
 
     try:
-        note = manager.create_note(title=title, content=content)
+        note = get_manager(create=True).create_note(title=title, content=content, tags=tags, metadata=metadata)
         console.print(f"Note created with ID: [bold green]{note.id}[/bold green]")
     except Exception as e:
         console.print(f"Error creating note: [bold red]{e}[/bold red]")
@@ -43,6 +124,7 @@ def delete(
 ) -> None:
     """Delete a note."""
     try:
+        manager = get_manager()
         note_to_delete = manager.find_note_by_prefix(short_id)
 
         console.print(f"Found note: '[bold]{note_to_delete.title}[/bold]' (ID: {note_to_delete.id})")
@@ -65,23 +147,41 @@ def delete(
         console.print(f"Error: {e}")
 
 @app.command(name="list")
-def list_notes() -> None:
-    """List all notes."""
-    notes = manager.list_all_notes()
+def list_notes(
+    tags: Optional[List[str]] = typer.Option(None, "--tag", "-g", help="Only notes with this tag(can be repeated)."),  # noqa: B008
+    meta: Optional[List[str]] = typer.Option(None, "--meta", "-m", help="Only notes with key=value metadata."),  # noqa: B008
+    since: Optional[datetime] = typer.Option(None, "--since", formats=DATE_FORMATS, help="From this date(UTC)."),  # noqa: B008
+    until: Optional[datetime] = typer.Option(None, "--until", formats=DATE_FORMATS, help="Before this date(UTC)."),  # noqa: B008
+    by: str = typer.Option("created", "--by", help="Time field of --since/--until: created or updated."),
+) -> None:
+    """List all notes(or filter them by tags, metadata and dates)."""
+    try:
+        # Summaries(dates are already formatted) and tag counts in one call, one round trip with the daemon.
+        notes, tag_counts = get_manager().list_filtered_summaries(
+            tags=tags, metadata=parse_key_values(meta), since=since, until=until, time_field=f"{by}_at"
+        )
+    except ValueError as e:
+        console.print(f"Error: {e}", style="bold red")
+        return
+
     if not notes:
         console.print("No notes found.")
         return
 
-    table = Table("ID", "Title", "Created", "Updated")
+    table = Table("ID", "Title", "Tags", "Created", "Updated")
     for note in notes:
         table.add_row(
             f"[bold blue]{note.id!s}[/bold blue]",
             f"[bold purple]{note.title!s}[/bold purple]",
-            f"[bold green]{note.created_at.strftime('%Y-%m-%d %H:%M')!s}[/bold green]",
-            f"[bold yellow]{note.updated_at.strftime('%Y-%m-%d %H:%M')!s}[/bold yellow]"
+            ", ".join(note.tags),
+            f"[bold green]{note.created!s}[/bold green]",
+            f"[bold yellow]{note.updated!s}[/bold yellow]"
         )
     console.print(table)
 
+    if tag_counts: # facets of the listed notes
+        console.print("Tags: " + ", ".join(f"{tag} ({count})" for tag, count in tag_counts.items()))
+
 @app.command()
 def search(
     query: str = typer.Argument(..., help="The text to search for it (titles and contents).")
@@ -89,7 +189,7 @@ def search(
     """Searche notes by title or content."""
     console.print(f"Searching for notes containing: '[bold yellow]{query}[/bold yellow]'")
 
-    results = manager.search_notes(query)
+    results = get_manager().search_notes(query)
 
     if not results:
         console.print("No matching notes found.")
@@ -114,13 +214,22 @@ def show_note(
 ) -> None:
     """Show details of a specific note."""
     try:
-        note = manager.find_note_by_prefix(short_id) # Find by short Id
+        note = get_manager().find_note_by_prefix(short_id) # Find by short Id
 
 
         content_display = Text()
         content_display.append(f"ID: {note.id}\n", style="cyan")
         content_display.append(f"Created: {note.created_at.strftime('%Y-%m-%d %H:%M:%S')}\n", style="dim")
         content_display.append(f"Updated: {note.updated_at.strftime('%Y-%m-%d %H:%M:%S')}\n", style="dim")
+        if note.tags:
+            content_display.append(f"Tags: {', '.join(note.tags)}\n", style="magenta")
+        for key, value in note.metadata.items():
+            content_display.append(f"{key}: {value}\n", style="dim")
+        for attachment in note.attachments:
+            content_display.append(
+                f"Attachment: {attachment.filename} ({format_size(attachment.size)}, {attachment.digest[:12]})\n",
+                style="blue"
+            )
         content_display.append("─" * 40 + "\n", style="dim") # A separator line
         content_display.append(note.content)
 
@@ -146,10 +255,14 @@ def show_note(
 
 @app.command(name="update")
 def update_note(
-    short_id: str = typer.Argument(..., help="Just enter first characters of Id.")
+    short_id: str = typer.Argument(..., help="Just enter first characters of Id."),
+    tags: Optional[List[str]] = typer.Option(None, "--tag", "-g", help="Replace tags(can be repeated)."),  # noqa: B008
+    meta: Optional[List[str]] = typer.Option(None, "--meta", "-m", help="Replace metadata with key=value pairs."),  # noqa: B008
 ) -> None:
     """Update an existing note."""
     try:
+        manager = get_manager()
+        metadata = parse_key_values(meta) if meta else None # None means keep the old metadata
         note = manager.find_note_by_prefix(short_id)
 
         console.print(f"Updating note: '[bold]{note.title}[/bold]'")
@@ -160,14 +273,17 @@ def update_note(
 
 
         if new_content is None: # if No Changes made
-            console.print("No changes.")
             new_content = note.content
-            return
+            if not tags and metadata is None: # tags or metadata may still be changed
+                console.print("No changes.")
+                return
 
         updated_note = manager.update_note(
             note_id=note.id,
             title=new_title,
-            content=new_content
+            content=new_content,
+            tags=tags or None,
+            metadata=metadata
         )
 
         if updated_note:
@@ -185,6 +301,59 @@ def update_note(
     except ValueError as e:
         console.print(f"Error: {e}", style="bold red")
 
+@app.command(name="attach")
+def attach_file(
+    short_id: str = typer.Argument(..., help="Just enter first characters of Id."),
+    file_path: Path = typer.Argument(..., exists=True, dir_okay=False, readable=True, help="File to attach."),  # noqa: B008
+) -> None:
+    """Attach a file to a note."""
+    try:
+        manager = get_manager()
+        note = manager.find_note_by_prefix(short_id)
+        digest, size = BlobStore(BLOBS_PATH).put_file(file_path)
+        content_type = mimetypes.guess_type(file_path.name)[0] or "application/octet-stream"
+        manager.add_attachment(
+            note.id,
+            Attachment(filename=file_path.name, digest=digest, size=size, content_type=content_type)
+        )
+        console.print(f"Attached '[bold]{file_path.name}[/bold]' ({format_size(size)}) to '[bold]{note.title}[/bold]'.")
+
+    except NoteNotFoundError as e:
+        console.print(f"Error: {e}", style="bold red")
+    except NotUniqueIDError as e:
+        console.print(f"Error: Not Unique ID prefix '{short_id}'.", style="bold red")
+        console.print("More than one note found.")
+        for full_id in e.matches:
+            console.print(f"  - {full_id}")
+    except (ValueError, OSError) as e:
+        console.print(f"Error: {e}", style="bold red")
+
+@app.command(name="sync")
+def sync_notes(
+    other: str = typer.Argument(..., help="Path of another notes.json, or URL of a running `note web`."),
+    policy: str = typer.Option("newest", "--policy", help="Conflict policy: newest, local or remote."),
+) -> None:
+    """Two-way sync with another note store."""
+    if policy not in CONFLICT_POLICIES:
+        choices = ", ".join(CONFLICT_POLICIES)
+        console.print(f"Error: Unknown policy '{policy}'. Choose from: {choices}.", style="bold red")
+        return
+
+    # Sync needs the Merkle tree, so it works on the Json file(a running daemon reloads it afterwards).
+    require_notebook(create=True)
+    try:
+        report = sync_stores(open_json_manager(), open_peer(other), policy=CONFLICT_POLICIES[policy])
+    except (SyncError, ValueError, OSError) as e:
+        console.print(f"Error: {e}", style="bold red")
+        return
+
+    console.print(
+        f"Synced with [bold]{other}[/bold]: "
+        f"[bold green]{report.pulled}[/bold green] pulled, "
+        f"[bold yellow]{report.pushed}[/bold yellow] pushed, "
+        f"{report.conflicts} conflicts."
+    )
+
 @app.command(name="web")
 def run_web_app(
     host: str = typer.Option("127.0.0.1", "--host", "-h", help="The network address to bind the server to."),
@@ -194,7 +363,31 @@ def run_web_app(
     console.print(f"Starting web server at [bold green]http://{host}:{port}[/bold green]")
     console.print("Press CTRL+C to stop.")
 
+    from note.web_app import create_app  # noqa: PLC0415 (web stack is heavy, other commands don't need it)
+
     web_app = create_app()
 
     # Run the server with uvicorn
+    import uvicorn  # noqa: PLC0415
+
     uvicorn.run(web_app, host=host, port=port)
+
+@app.command(name="daemon")
+def run_daemon(
+    socket_path: Path = typer.Option(SOCKET_PATH, "--socket", help="Unix socket to listen on."),  # noqa: B008
+) -> None:
+    """Keep notes loaded in a resident process, so other commands start faster."""
+    if not daemon_supported():
+        console.print("Error: Unix domain sockets are not supported on this platform.", style="bold red")
+        raise typer.Exit(code=1)
+
+    note_daemon = NoteDaemon(socket_path, db_path=DB_PATH, notebooks_path=NOTEBOOKS_PATH)
+    console.print(f"Daemon is listening on [bold green]{socket_path}[/bold green]")
+    console.print("Press CTRL+C to stop.")
+    try:
+        note_daemon.serve_forever()
+    except DaemonError as e:
+        console.print(f"Error: {e}", style="bold red")
+        raise typer.Exit(code=1) from e
+    except KeyboardInterrupt:
+        console.print("Daemon stopped.")
@@ -0,0 +1,377 @@
+import json
+import logging
+import socket
+import socketserver
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from note.exceptions import DaemonError, NotebookNotFoundError, NoteNotFoundError, NotUniqueIDError
+from note.interfaces import INoteManager
+from note.models import Attachment, Note, NoteSummary
+from note.pool import NotebookPool
+from note.services import JsonNoteManager
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Protocol: one JSON object per line in both directions.
+# request:  {"method": "search_notes", "params": {"query": "..."}, "notebook": null}
+# response: {"ok": true, "result": ...} or {"ok": false, "error": {"type": "...", "message": "...", ...}}
+
+
+def daemon_supported() -> bool:
+    """Unix domain sockets are not available on every platform(e.g. old Windows)."""
+    return hasattr(socket, "AF_UNIX")
+
+
+def _dump_note(note: Optional[Note]) -> Optional[Dict[str, Any]]:
+    """Note to JSON-able dict."""
+    return note.model_dump(mode="json") if note else None
+
+def _dump_notes(notes: Iterable[Note]) -> List[Dict[str, Any]]:
+    """Notes to JSON-able dicts."""
+    return [note.model_dump(mode="json") for note in notes]
+
+def _dump_listing(summaries: List[NoteSummary], tag_counts: Dict[str, int]) -> Dict[str, Any]:
+    """Summaries and tag counts of a list page to a JSON-able dict."""
+    return {"summaries": [summary.model_dump(mode="json") for summary in summaries], "tag_counts": tag_counts}
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    """ISO string to datetime."""
+    return datetime.fromisoformat(value) if value else None
+
+def _parse_ids(values: Optional[List[str]]) -> Optional[List[uuid.UUID]]:
+    """Strings to UUIDs(None stays None, it means all notes)."""
+    return [uuid.UUID(value) for value in values] if values is not None else None
+
+
+# Every method the daemon serves: it gets a manager and JSON params and returns a JSON-able result.
+_METHODS: Dict[str, Callable[[INoteManager, Dict[str, Any]], Any]] = {
+    "ping": lambda _manager, _params: "pong",
+    "list_all_notes": lambda manager, _params: _dump_notes(manager.list_all_notes()),
+    "list_note_summaries": lambda manager, params: [
+        summary.model_dump(mode="json") for summary in manager.list_note_summaries(_parse_ids(params.get("note_ids")))
+    ],
+    "get_note_by_id": lambda manager, params: _dump_note(manager.get_note_by_id(uuid.UUID(params["note_id"]))),
+    "find_note_by_prefix": lambda manager, params: _dump_note(manager.find_note_by_prefix(params["short_id"])),
+    "search_notes": lambda manager, params: _dump_notes(manager.search_notes(params["query"])),
+    "filter_notes": lambda manager, params: _dump_notes(manager.filter_notes(
+        tags=params.get("tags"),
+        metadata=params.get("metadata"),
+        since=_parse_time(params.get("since")),
+        until=_parse_time(params.get("until")),
+        time_field=params.get("time_field", "created_at"),
+    )),
+    "count_tags": lambda manager, params: manager.count_tags(_parse_ids(params.get("note_ids"))),
+    "list_filtered_summaries": lambda manager, params: _dump_listing(*manager.list_filtered_summaries(
+        tags=params.get("tags"),
+        metadata=params.get("metadata"),
+        since=_parse_time(params.get("since")),
+        until=_parse_time(params.get("until")),
+        time_field=params.get("time_field", "created_at"),
+    )),
+    "create_note": lambda manager, params: _dump_note(manager.create_note(
+        title=params["title"], content=params["content"], tags=params.get("tags"), metadata=params.get("metadata")
+    )),
+    "update_note": lambda manager, params: _dump_note(manager.update_note(
+        note_id=uuid.UUID(params["note_id"]),
+        title=params["title"],
+        content=params["content"],
+        tags=params.get("tags"),
+        metadata=params.get("metadata"),
+    )),
+    "delete_note": lambda manager, params: manager.delete_note(uuid.UUID(params["note_id"])),
+    "add_attachment": lambda manager, params: _dump_note(manager.add_attachment(
+        uuid.UUID(params["note_id"]), Attachment(**params["attachment"])
+    )),
+}
+
+_CREATING_METHODS = {"create_note"} # only these create a missing notebook
+
+# Calls which can be repeated on the Json file if the daemon goes away after it got the request.
+_READ_ONLY_METHODS = {
+    "ping", "list_all_notes", "list_note_summaries", "get_note_by_id", "find_note_by_prefix",
+    "search_notes", "filter_notes", "count_tags", "list_filtered_summaries",
+}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Serves requests of one client connection."""
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            response = self.server.note_daemon.dispatch(line) # type: ignore[attr-defined]
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class NoteDaemon:
+    """
+    Keeps managers(with their indexes and caches) loaded and serves them over a Unix domain socket,
+    so CLI commands don't load notes.json in each run.
+    Files are still saved on every change and reloaded if someone else changes them(e.g. web app).
+    """
+
+    def __init__(self, socket_path: Path, db_path: Path, notebooks_path: Path) -> None:
+        self._socket_path = socket_path
+        self._default_manager = JsonNoteManager(db_path)
+        # Same budget as the web app's pool. Autosave stays on, CLI commands expect their changes on disk.
+        self._pool = NotebookPool(
+            notebooks_path,
+            max_open=settings.NOTEBOOK_POOL_SIZE,
+            max_bytes=settings.NOTEBOOK_POOL_MAX_BYTES,
+        )
+        self._lock = threading.Lock() # managers are not thread-safe
+        self._server: Optional[socketserver.ThreadingUnixStreamServer] = None
+
+    def _manager_for(self, notebook: Optional[str], *, create: bool = False) -> INoteManager:
+        """Returns(and refreshes) the manager of a notebook, or the default one. Only writes create notebooks."""
+        if notebook is None:
+            self._default_manager.reload_if_changed()
+            return self._default_manager
+        return self._pool.get(notebook, create=create)
+
+    def dispatch(self, raw_request: bytes) -> Dict[str, Any]:
+        """Runs one request and returns its response(errors are returned, not raised)."""
+        try:
+            request = json.loads(raw_request)
+            method = _METHODS.get(request.get("method"))
+            if method is None:
+                msg = f"Unknown method '{request.get('method')}'."
+                raise ValueError(msg)
+            if request["method"] == "ping": # no manager needed, clients can connect before their notebook exists
+                return {"ok": True, "result": "pong"}
+            creates = request["method"] in _CREATING_METHODS
+            with self._lock:
+                manager = self._manager_for(request.get("notebook"), create=creates)
+                result = method(manager, request.get("params") or {})
+            return {"ok": True, "result": result}
+        except NotUniqueIDError as e:
+            return {"ok": False, "error": {"type": "NotUniqueIDError", "message": str(e), "matches": e.matches}}
+        except NoteNotFoundError as e:
+            return {"ok": False, "error": {"type": "NoteNotFoundError", "message": str(e)}}
+        except NotebookNotFoundError as e:
+            return {"ok": False, "error": {"type": "NotebookNotFoundError", "message": str(e)}}
+        except (ValueError, KeyError, TypeError) as e:
+            return {"ok": False, "error": {"type": "ValueError", "message": str(e)}}
+        except Exception as e:
+            logger.exception("Daemon request failed.")
+            return {"ok": False, "error": {"type": type(e).__name__, "message": str(e)}}
+
+    def serve_forever(self) -> None:
+        """Listens on the socket until `shutdown()` is called(or CTRL+C)."""
+        if DaemonNoteManager.connect(self._socket_path) is not None:
+            msg = f"A daemon is already running on {self._socket_path}."
+            raise DaemonError(msg)
+        self._socket_path.unlink(missing_ok=True) # left by a daemon which was killed
+
+        self._server = socketserver.ThreadingUnixStreamServer(str(self._socket_path), _RequestHandler)
+        self._server.daemon_threads = True
+        self._server.note_daemon = self # type: ignore[attr-defined]
+        self._socket_path.chmod(0o600) # only the owner can read notes through the socket
+        logger.info(f"Daemon is listening on {self._socket_path}.")
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self._socket_path.unlink(missing_ok=True)
+            self._pool.close()
+            logger.info("Daemon stopped.")
+
+    def shutdown(self) -> None:
+        """Stops `serve_forever()`(from another thread)."""
+        if self._server:
+            self._server.shutdown()
+
+
+class DaemonNoteManager(INoteManager):
+    """
+    A note manager which forwards every call to a running daemon.
+    If the daemon goes away(stopped or restarted) and a `fallback` is given, calls are served by the manager
+    it returns(e.g. the Json file). Writes which the daemon may have already received are not repeated,
+    they raise DaemonError instead.
+    """
+
+    def __init__(
+        self,
+        socket_path: Path,
+        notebook: Optional[str] = None,
+        timeout: float = 30.0,
+        fallback: Optional[Callable[[], INoteManager]] = None,
+    ) -> None:
+        self._socket_path = socket_path
+        self._notebook = notebook
+        self._timeout = timeout
+        self._fallback = fallback
+        self._fallback_manager: Optional[INoteManager] = None
+
+    @classmethod
+    def connect(
+        cls,
+        socket_path: Path,
+        notebook: Optional[str] = None,
+        timeout: float = 30.0,
+        fallback: Optional[Callable[[], INoteManager]] = None,
+    ) -> Optional["DaemonNoteManager"]:
+        """Returns a client if a daemon is running on `socket_path`, otherwise None."""
+        if not daemon_supported() or not socket_path.exists():
+            return None
+        client = cls(socket_path, notebook, timeout, fallback)
+        try:
+            client._send("ping", {})
+        except (OSError, DaemonError):
+            return None
+        return client
+
+    def _send(self, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Sends one request to the daemon and returns its raw response."""
+        request = {"method": method, "params": params, "notebook": self._notebook}
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(self._timeout)
+            client.connect(str(self._socket_path))
+            client.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            with client.makefile("rb") as reader:
+                line = reader.readline()
+        if not line:
+            msg = "Daemon closed the connection without a response."
+            raise DaemonError(msg)
+        return json.loads(line)
+
+    def _call(self, method: str, **params: Any) -> Any:
+        """Sends one request and returns its result(daemon errors are raised again here)."""
+        if self._fallback_manager is not None: # the daemon went away before, don't wait for it again
+            return _METHODS[method](self._fallback_manager, params)
+        try:
+            response = self._send(method, params)
+        except (OSError, DaemonError) as e:
+            # A refused connection means the request never arrived, so even writes can be done on the file.
+            not_sent = isinstance(e, (ConnectionRefusedError, FileNotFoundError))
+            if self._fallback is None or not (not_sent or method in _READ_ONLY_METHODS):
+                msg = f"Daemon failed during '{method}' ({e}). Check the result, or run again with --no-daemon."
+                raise DaemonError(msg) from e
+            logger.warning(f"Daemon is not available ({e}), using the Json file instead.")
+            self._fallback_manager = self._fallback()
+            return _METHODS[method](self._fallback_manager, params)
+
+        if response["ok"]:
+            return response["result"]
+
+        error = response["error"]
+        if error["type"] == "NotUniqueIDError":
+            raise NotUniqueIDError(matches=error["matches"])
+        if error["type"] == "NoteNotFoundError":
+            raise NoteNotFoundError(error["message"])
+        if error["type"] == "NotebookNotFoundError":
+            raise NotebookNotFoundError(error["message"])
+        if error["type"] == "ValueError":
+            raise ValueError(error["message"])
+        msg = f"{error['type']}: {error['message']}"
+        raise DaemonError(msg)
+
+    @staticmethod
+    def _note(data: Optional[Dict[str, Any]]) -> Optional[Note]:
+        """JSON dict to Note."""
+        return Note(**data) if data else None
+
+    def create_note(
+        self,
+        title: str,
+        content: str,
+        tags: Optional[List[str]] = None,
+        metadata: Optional[Dict[str, str]] = None,
+    ) -> Note:
+        """Creates a new note."""
+        return Note(**self._call("create_note", title=title, content=content, tags=tags, metadata=metadata))
+
+    def get_note_by_id(self, note_id: uuid.UUID) -> Optional[Note]:
+        """Retrieves a single note by its ID."""
+        return self._note(self._call("get_note_by_id", note_id=str(note_id)))
+
+    def list_all_notes(self) -> List[Note]:
+        """Returns a list of all notes."""
+        return [Note(**data) for data in self._call("list_all_notes")]
+
+    def update_note(
+        self,
+        note_id: uuid.UUID,
+        title: str,
+        content: str,
+        tags: Optional[List[str]] = None,
+        metadata: Optional[Dict[str, str]] = None,
+    ) -> Optional[Note]:
+        """Updates an existing note."""
+        return self._note(self._call(
+            "update_note", note_id=str(note_id), title=title, content=content, tags=tags, metadata=metadata
+        ))
+
+    def delete_note(self, note_id: uuid.UUID) -> bool:
+        """Deletes a note by its ID."""
+        return self._call("delete_note", note_id=str(note_id))
+
+    def search_notes(self, query: str) -> List[Note]:
+        """Retrieves notes by searching in title and content."""
+        return [Note(**data) for data in self._call("search_notes", query=query)]
+
+    def find_note_by_prefix(self, short_id: str) -> Note:
+        """Retrieves notes by prefix of id."""
+        return Note(**self._call("find_note_by_prefix", short_id=short_id))
+
+    def list_note_summaries(self, note_ids: Optional[Iterable[uuid.UUID]] = None) -> List[NoteSummary]:
+        """Returns precomputed display summaries of all notes(or just the given ones)."""
+        ids = [str(note_id) for note_id in note_ids] if note_ids is not None else None
+        return [NoteSummary(**data) for data in self._call("list_note_summaries", note_ids=ids)]
+
+    def filter_notes(
+        self,
+        tags: Optional[List[str]] = None,
+        metadata: Optional[Dict[str, str]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        time_field: str = "created_at",
+    ) -> List[Note]:
+        """Retrieves notes by tags, metadata and time range(using daemon's indexes)."""
+        notes_data = self._call(
+            "filter_notes",
+            tags=tags,
+            metadata=metadata,
+            since=since.isoformat() if since else None,
+            until=until.isoformat() if until else None,
+            time_field=time_field,
+        )
+        return [Note(**data) for data in notes_data]
+
+    def count_tags(self, note_ids: Optional[Iterable[uuid.UUID]] = None) -> Dict[str, int]:
+        """Returns number of notes per tag."""
+        ids = [str(note_id) for note_id in note_ids] if note_ids is not None else None
+        return self._call("count_tags", note_ids=ids)
+
+    def list_filtered_summaries(
+        self,
+        tags: Optional[List[str]] = None,
+        metadata: Optional[Dict[str, str]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        time_field: str = "created_at",
+    ) -> Tuple[List[NoteSummary], Dict[str, int]]:
+        """Returns summaries of matching notes and their tag counts(one round trip instead of three)."""
+        listing = self._call(
+            "list_filtered_summaries",
+            tags=tags,
+            metadata=metadata,
+            since=since.isoformat() if since else None,
+            until=until.isoformat() if until else None,
+            time_field=time_field,
+        )
+        return [NoteSummary(**data) for data in listing["summaries"]], listing["tag_counts"]
+
+    def add_attachment(self, note_id: uuid.UUID, attachment: Attachment) -> Optional[Note]:
+        """Adds attachment metadata to a note."""
+        return self._note(self._call(
+            "add_attachment", note_id=str(note_id), attachment=attachment.model_dump(mode="json")
+        ))
+
+    def flush(self) -> None:
+        """Daemon saves every change itself."""
+        pass
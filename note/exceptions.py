@@ -7,3 +7,19 @@ class NotUniqueIDError(Exception):
     def __init__(self, matches: list[str]):
         self.matches = matches
         super().__init__(f"ID is not unique. Found matches: {matches}")
+
+class NotebookNotFoundError(Exception):
+    """Raised when a notebook does not exist(only writes create notebooks)."""
+    pass
+
+class DaemonError(Exception):
+    """Raised when the note daemon can not serve a request."""
+    pass
+
+class SyncError(Exception):
+    """Raised when syncing with another note store fails."""
+    pass
+
+class StorageError(Exception):
+    """Raised when a notes file can not be read(e.g. it is broken), so it must not be overwritten."""
+    pass
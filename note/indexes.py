@@ -0,0 +1,135 @@
+import uuid
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from note.models import Note
+from note.utils import as_utc
+
+TIME_FIELDS = ("created_at", "updated_at")
+
+
+class SortedTimeIndex:
+    """A sorted list of (timestamp, note id), so range queries are just two binary searches."""
+
+    def __init__(self) -> None:
+        self._entries: List[Tuple[datetime, uuid.UUID]] = []
+
+    def add(self, moment: datetime, note_id: uuid.UUID) -> None:
+        """Inserts a note at its place in the index."""
+        insort(self._entries, (moment, note_id))
+
+    def add_many(self, entries: Iterable[Tuple[datetime, uuid.UUID]]) -> None:
+        """Adds many notes with a single sort(e.g. on load), instead of one `insort` per note."""
+        self._entries.extend(entries)
+        self._entries.sort()
+
+    def remove(self, moment: datetime, note_id: uuid.UUID) -> None:
+        """Removes a note from the index(if it exists)."""
+        position = bisect_left(self._entries, (moment, note_id))
+        if position < len(self._entries) and self._entries[position] == (moment, note_id):
+            del self._entries[position]
+
+    def between(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> List[uuid.UUID]:
+        """Returns IDs of notes in [since, until), ordered by time."""
+        # A one-item tuple sorts before every (moment, id) tuple with the same moment.
+        start = bisect_left(self._entries, (as_utc(since),)) if since else 0
+        stop = bisect_left(self._entries, (as_utc(until),)) if until else len(self._entries)
+        return [note_id for _, note_id in self._entries[start:stop]]
+
+
+class NoteIndex:
+    """
+    Secondary indexes over notes: tag -> IDs, (key, value) -> IDs and sorted created/updated times.
+    Managers update it on every mutation, so filters never scan all notes.
+    """
+
+    def __init__(self) -> None:
+        self._by_tag: Dict[str, Set[uuid.UUID]] = {}
+        self._by_metadata: Dict[Tuple[str, str], Set[uuid.UUID]] = {}
+        self._by_time: Dict[str, SortedTimeIndex] = {field: SortedTimeIndex() for field in TIME_FIELDS}
+
+    def add(self, note: Note) -> None:
+        """Adds a note to all indexes."""
+        self._add_keys(note)
+        for field, time_index in self._by_time.items():
+            time_index.add(getattr(note, field), note.id)
+
+    def add_all(self, notes: Iterable[Note]) -> None:
+        """Adds many notes at once(e.g. on load). Each time index is sorted once."""
+        notes = list(notes)
+        for note in notes:
+            self._add_keys(note)
+        for field, time_index in self._by_time.items():
+            time_index.add_many((getattr(note, field), note.id) for note in notes)
+
+    def _add_keys(self, note: Note) -> None:
+        """Adds a note to tag and metadata indexes."""
+        for tag in note.tags:
+            self._by_tag.setdefault(tag, set()).add(note.id)
+        for item in note.metadata.items():
+            self._by_metadata.setdefault(item, set()).add(note.id)
+
+    def remove(self, note: Note) -> None:
+        """
+        Removes a note from all indexes.
+        It SHOULD be called before the note is changed, because it uses the old values to find entries.
+        """
+        for tag in note.tags:
+            self._discard(self._by_tag, tag, note.id)
+        for item in note.metadata.items():
+            self._discard(self._by_metadata, item, note.id)
+        for field, time_index in self._by_time.items():
+            time_index.remove(getattr(note, field), note.id)
+
+    @staticmethod
+    def _discard(index: dict, key, note_id: uuid.UUID) -> None:
+        """Removes an ID from an index bucket and drops the bucket when it gets empty."""
+        bucket = index.get(key)
+        if bucket is None:
+            return
+        bucket.discard(note_id)
+        if not bucket:
+            del index[key]
+
+    def query(
+        self,
+        tags: Optional[Iterable[str]] = None,
+        metadata: Optional[Dict[str, str]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        time_field: str = "created_at",
+    ) -> List[uuid.UUID]:
+        """
+        Returns IDs of notes which have ALL given tags and metadata and are in the time range.
+        Result is ordered by `time_field`.
+        """
+        if time_field not in TIME_FIELDS:
+            msg = f"time_field must be one of {TIME_FIELDS}, not '{time_field}'."
+            raise ValueError(msg)
+
+        buckets = [self._by_tag.get(tag, set()) for tag in tags or []]
+        buckets += [self._by_metadata.get(item, set()) for item in (metadata or {}).items()]
+
+        in_range = self._by_time[time_field].between(since, until)
+        if not buckets:
+            return in_range
+
+        # Intersect the smallest sets first, so each step is as cheap as possible.
+        buckets.sort(key=len)
+        matches = set(buckets[0])
+        for bucket in buckets[1:]:
+            matches &= bucket
+            if not matches:
+                return []
+
+        return [note_id for note_id in in_range if note_id in matches]
+
+    def tag_counts(self, note_ids: Optional[Iterable[uuid.UUID]] = None) -> Dict[str, int]:
+        """Counts notes per tag(facets), only among `note_ids` if given."""
+        if note_ids is None:
+            return {tag: len(ids) for tag, ids in sorted(self._by_tag.items())}
+
+        selected = set(note_ids)
+        counts = {tag: len(ids & selected) for tag, ids in sorted(self._by_tag.items())}
+        return {tag: count for tag, count in counts.items() if count}
@@ -1,15 +1,23 @@
 import uuid
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
-from note.models import Note
+from note.merkle import MerkleTree
+from note.models import Attachment, Note, NoteSummary
 
 
 class INoteManager(ABC):
     """A Contract for all note managers(JSON, SQL, etc.)."""
 
     @abstractmethod
-    def create_note(self, title: str, content: str) -> Note:
+    def create_note(
+        self,
+        title: str,
+        content: str,
+        tags: Optional[List[str]] = None,
+        metadata: Optional[Dict[str, str]] = None,
+    ) -> Note:
         """Creates a new note."""
         raise NotImplementedError
 
@@ -24,7 +32,14 @@ class INoteManager(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    def update_note(self, note_id: uuid.UUID, title: str, content: str) -> Optional[Note]:
+    def update_note(
+        self,
+        note_id: uuid.UUID,
+        title: str,
+        content: str,
+        tags: Optional[List[str]] = None,
+        metadata: Optional[Dict[str, str]] = None,
+    ) -> Optional[Note]:
         """Updates an existing note."""
         raise NotImplementedError
 
@@ -41,3 +56,77 @@ class INoteManager(ABC):
     def find_note_by_prefix(self, short_id: str) -> Note:
         """Retrieves notes by prefix of id."""
         raise NotImplementedError
+
+    def list_note_summaries(self, note_ids: Optional[Iterable[uuid.UUID]] = None) -> List[NoteSummary]:
+        """Returns precomputed display summaries of all notes(or just the given ones)."""
+        raise NotImplementedError
+
+    def filter_notes(
+        self,
+        tags: Optional[List[str]] = None,
+        metadata: Optional[Dict[str, str]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        time_field: str = "created_at",
+    ) -> List[Note]:
+        """Retrieves notes by tags, metadata and time range(using indexes)."""
+        raise NotImplementedError
+
+    def count_tags(self, note_ids: Optional[Iterable[uuid.UUID]] = None) -> Dict[str, int]:
+        """Returns number of notes per tag."""
+        raise NotImplementedError
+
+    def list_filtered_summaries(
+        self,
+        tags: Optional[List[str]] = None,
+        metadata: Optional[Dict[str, str]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        time_field: str = "created_at",
+    ) -> Tuple[List[NoteSummary], Dict[str, int]]:
+        """Returns summaries of matching notes(all notes without filters) and their tag counts in one call."""
+        raise NotImplementedError
+
+    def put_notes(self, notes: List[Note]) -> None:
+        """Stores notes as they are(with their IDs and timestamps). Tombstones delete the notes."""
+        raise NotImplementedError
+
+    def get_notes_for_sync(self, note_ids: Iterable[uuid.UUID]) -> List[Note]:
+        """Retrieves notes by their IDs, tombstones of deleted notes included(missing ones are skipped)."""
+        raise NotImplementedError
+
+    def add_attachment(self, note_id: uuid.UUID, attachment: Attachment) -> Optional[Note]:
+        """Adds attachment metadata to a note."""
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Writes pending changes to storage."""
+        raise NotImplementedError
+
+    def get_merkle_tree(self) -> MerkleTree:
+        """Returns Merkle tree of note hashes."""
+        raise NotImplementedError
+
+
+class ISyncPeer(ABC):
+    """A Contract for the other side of a sync(another local store, a web app, etc.)."""
+
+    @abstractmethod
+    def root_hash(self) -> str:
+        """Returns root hash of the store's Merkle tree."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def children_of(self, prefixes: Sequence[str]) -> Dict[str, Dict[str, str]]:
+        """Returns child hashes of the given Merkle tree nodes."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_notes(self, note_ids: Sequence[uuid.UUID]) -> List[Note]:
+        """Retrieves notes(or their tombstones) by their IDs(missing ones are skipped)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def put_notes(self, notes: List[Note]) -> None:
+        """Stores notes as they are."""
+        raise NotImplementedError
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import uuid
+from typing import Dict, Iterable, Set
+
+from note.models import Note
+
+BRANCH_PREFIX_LENGTH = 1 # first level: 16 branches, by the first hex character of ID
+LEAF_PREFIX_LENGTH = 2 # second level: 256 buckets, by the first two hex characters of ID
+
+
+def note_hash(note: Note) -> str:
+    """SHA-256 of a note's canonical JSON, so the same note has the same hash in every store."""
+    canonical = json.dumps(note.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _combine(children: Dict[str, str]) -> str:
+    """Hash of a tree node, made from its (sorted) children keys and hashes."""
+    digest = hashlib.sha256()
+    for key in sorted(children):
+        digest.update(f"{key}:{children[key]};".encode())
+    return digest.hexdigest()
+
+
+class MerkleTree:
+    """
+    A three-level Merkle tree over note hashes, bucketed by UUID prefix:
+    root -> branches("0".."f") -> buckets("00".."ff") -> note IDs.
+    Managers update it on every write. Node hashes are recomputed lazily and only for changed buckets.
+    """
+
+    def __init__(self) -> None:
+        self._buckets: Dict[str, Dict[str, str]] = {} # bucket prefix -> {note id: note hash}
+        self._bucket_hashes: Dict[str, str] = {}
+        self._branch_hashes: Dict[str, str] = {}
+        self._root_hash = _combine({})
+        self._dirty: Set[str] = set() # buckets changed since last refresh
+
+    def add(self, note_id: uuid.UUID, digest: str) -> None:
+        """Adds(or replaces) a note hash."""
+        key = str(note_id)
+        bucket = key[:LEAF_PREFIX_LENGTH]
+        self._buckets.setdefault(bucket, {})[key] = digest
+        self._dirty.add(bucket)
+
+    def remove(self, note_id: uuid.UUID) -> None:
+        """Removes a note hash(if it exists)."""
+        key = str(note_id)
+        bucket = key[:LEAF_PREFIX_LENGTH]
+        if self._buckets.get(bucket, {}).pop(key, None) is not None:
+            self._dirty.add(bucket)
+
+    def _refresh(self) -> None:
+        """Recomputes hashes of changed buckets, their branches and the root."""
+        if not self._dirty:
+            return
+
+        for bucket in self._dirty:
+            if self._buckets.get(bucket):
+                self._bucket_hashes[bucket] = _combine(self._buckets[bucket])
+            else:
+                self._buckets.pop(bucket, None)
+                self._bucket_hashes.pop(bucket, None)
+
+        for branch in {bucket[:BRANCH_PREFIX_LENGTH] for bucket in self._dirty}:
+            children = self._children_of_branch(branch)
+            if children:
+                self._branch_hashes[branch] = _combine(children)
+            else:
+                self._branch_hashes.pop(branch, None)
+
+        self._root_hash = _combine(self._branch_hashes)
+        self._dirty.clear()
+
+    def _children_of_branch(self, branch: str) -> Dict[str, str]:
+        """Bucket hashes under a branch(at most 16 of them)."""
+        candidates = (branch + f"{digit:x}" for digit in range(16))
+        return {bucket: self._bucket_hashes[bucket] for bucket in candidates if bucket in self._bucket_hashes}
+
+    @property
+    def root_hash(self) -> str:
+        """Hash of the whole tree. Two stores with the same notes have the same root hash."""
+        self._refresh()
+        return self._root_hash
+
+    def children(self, prefix: str) -> Dict[str, str]:
+        """
+        Returns child hashes of a node:
+        "" -> branches, one hex character -> buckets, two hex characters -> note IDs.
+        """
+        self._refresh()
+        if len(prefix) == 0:
+            return dict(self._branch_hashes)
+        if len(prefix) == BRANCH_PREFIX_LENGTH:
+            return self._children_of_branch(prefix)
+        if len(prefix) == LEAF_PREFIX_LENGTH:
+            return dict(self._buckets.get(prefix, {}))
+
+        msg = f"Prefix must have at most {LEAF_PREFIX_LENGTH} characters, got '{prefix}'."
+        raise ValueError(msg)
+
+    def children_of(self, prefixes: Iterable[str]) -> Dict[str, Dict[str, str]]:
+        """`children` for many nodes at once(one round trip per tree level for remote stores)."""
+        return {prefix: self.children(prefix) for prefix in prefixes}
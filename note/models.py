@@ -1,7 +1,18 @@
 import uuid
 from datetime import datetime, timezone
+from typing import Dict, List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+
+from note.utils import as_utc, format_timestamp, make_snippet, normalize_tags
+
+
+class Attachment(BaseModel):
+    """Metadata of a file attached to a note. The file itself is in the blob store."""
+    filename : str
+    digest : str # SHA-256 of content, also the key in blob store
+    size : int
+    content_type : str = "application/octet-stream"
 
 
 class Note(BaseModel):
@@ -11,3 +22,44 @@ class Note(BaseModel):
     content : str
     created_at : datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    tags : List[str] = Field(default_factory=list)
+    metadata : Dict[str, str] = Field(default_factory=dict) # arbitrary key/value pairs
+    attachments : List[Attachment] = Field(default_factory=list)
+    deleted_at : Optional[datetime] = None # set on tombstones, so sync can spread deletions to other stores
+
+    @field_validator("tags")
+    @classmethod
+    def _clean_tags(cls, tags: List[str]) -> List[str]:
+        """Tags are case-insensitive, so we store them normalized."""
+        return normalize_tags(tags)
+
+    @field_validator("created_at", "updated_at", "deleted_at")
+    @classmethod
+    def _to_utc(cls, moment: Optional[datetime]) -> Optional[datetime]:
+        """Times are stored in UTC, so naive ones(e.g. from a hand-edited file) compare with the others."""
+        return as_utc(moment).astimezone(timezone.utc) if moment else None
+
+
+class NoteSummary(BaseModel):
+    """
+    Display-ready version of a Note for list pages.
+    Managers build it when a note is written, so templates don't format anything on each render.
+    """
+    id : uuid.UUID
+    title : str
+    snippet : str
+    created : str
+    updated : str
+    tags : List[str] = Field(default_factory=list)
+
+    @classmethod
+    def from_note(cls, note: Note) -> "NoteSummary":
+        """Precomputes the snippet and formatted timestamps of a note."""
+        return cls(
+            id=note.id,
+            title=note.title,
+            snippet=make_snippet(note.content),
+            created=format_timestamp(note.created_at),
+            updated=format_timestamp(note.updated_at),
+            tags=list(note.tags),
+        )
@@ -0,0 +1,134 @@
+import logging
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from note.exceptions import NotebookNotFoundError
+from note.services import JsonNoteManager
+
+logger = logging.getLogger(__name__)
+
+_NOTEBOOK_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def notebook_path(root: Path, name: str) -> Path:
+    """Returns JSON file of a notebook. Names are validated, so they can't point outside of `root`."""
+    if not _NOTEBOOK_NAME_PATTERN.match(name):
+        msg = f"Invalid notebook name '{name}'. Use letters, digits, '-' and '_' (at most 64 characters)."
+        raise ValueError(msg)
+    return root / f"{name}.json"
+
+
+def list_notebooks(root: Path) -> List[str]:
+    """Names of all notebooks in `root`."""
+    if not root.is_dir():
+        return []
+    return sorted(path.stem for path in root.glob("*.json") if _NOTEBOOK_NAME_PATTERN.match(path.stem))
+
+
+class NotebookPool:
+    """
+    Keeps recently used notebook managers loaded, and closes the least recently used ones
+    when there are more than `max_open` of them or their files are bigger than `max_bytes` in total.
+    Closed managers are flushed first, so nothing is lost. File size is used as a cheap estimate of memory.
+    Managers which are in use(`acquire` without `release` yet) are never closed, so their later writes are saved.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        max_open: int = 32,
+        max_bytes: Optional[int] = None,
+        *,
+        autosave: bool = True,
+    ) -> None:
+        if max_open < 1:
+            msg = "max_open must be at least 1."
+            raise ValueError(msg)
+        self._root = root
+        self._max_open = max_open
+        self._max_bytes = max_bytes
+        self._autosave = autosave
+        self._managers: OrderedDict[str, JsonNoteManager] = OrderedDict() # least recently used first
+        self._pins: Dict[str, int] = {} # notebook name -> number of requests using it
+        self._lock = threading.Lock() # FastAPI resolves dependencies in a thread pool
+
+    def get(self, name: str, *, create: bool = False) -> JsonNoteManager:
+        """
+        Returns the manager of a notebook, loading it if it is not open.
+        A missing notebook is created only if `create` is True(for writes), otherwise NotebookNotFoundError is raised.
+        The manager may be closed by a later call, so callers which keep it(e.g. during a web request)
+        should use `acquire` and `release` instead.
+        """
+        with self._lock:
+            manager = self._open(name, create=create)
+            self._evict()
+            return manager
+
+    def acquire(self, name: str, *, create: bool = False) -> JsonNoteManager:
+        """Like `get`, but the notebook stays open until `release` is called."""
+        with self._lock:
+            manager = self._open(name, create=create)
+            self._pins[name] = self._pins.get(name, 0) + 1
+            self._evict()
+            return manager
+
+    def release(self, name: str) -> None:
+        """Ends one `acquire` of a notebook. It can be closed again when nobody uses it."""
+        with self._lock:
+            self._pins[name] -= 1
+            if not self._pins[name]:
+                del self._pins[name]
+            self._evict()
+
+    def _open(self, name: str, *, create: bool) -> JsonNoteManager:
+        """Returns an open manager(refreshed from its file) or loads it."""
+        path = notebook_path(self._root, name)
+        manager = self._managers.get(name)
+        if manager is None:
+            if not create and not path.exists():
+                msg = f"Notebook '{name}' does not exist."
+                raise NotebookNotFoundError(msg)
+            self._root.mkdir(parents=True, exist_ok=True)
+            manager = JsonNoteManager(path, autosave=self._autosave)
+            self._managers[name] = manager
+            logger.info(f"Notebook '{name}' opened.")
+        else:
+            self._managers.move_to_end(name)
+            manager.reload_if_changed() # CLI may have changed the file
+        return manager
+
+    def _over_budget(self) -> bool:
+        """Checks limits of the pool. Sizes are read again each time, because notebooks grow after they are opened."""
+        if len(self._managers) > self._max_open:
+            return True
+        if self._max_bytes is None:
+            return False
+        return sum(manager.storage_size() for manager in self._managers.values()) > self._max_bytes
+
+    def _evict(self) -> None:
+        """
+        Closes least recently used notebooks until the pool is in budget.
+        The newest one and the ones in use always stay, so the pool may be over budget until they are released.
+        """
+        for name in list(self._managers)[:-1]: # least recently used first, without the newest one
+            if not self._over_budget():
+                return
+            if name in self._pins:
+                continue
+            self._managers.pop(name).flush()
+            logger.info(f"Notebook '{name}' closed.")
+
+    def open_notebooks(self) -> List[str]:
+        """Names of loaded notebooks, least recently used first."""
+        with self._lock:
+            return list(self._managers)
+
+    def close(self) -> None:
+        """Flushes and closes all notebooks."""
+        with self._lock:
+            for manager in self._managers.values():
+                manager.flush()
+            self._managers.clear()
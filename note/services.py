@@ -1,16 +1,25 @@
 import json
 import logging
+import os
+import shutil
+import tempfile
+import time
 import uuid
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
-from note.exceptions import NoteNotFoundError, NotUniqueIDError
+from note.exceptions import NoteNotFoundError, NotUniqueIDError, StorageError
+from note.indexes import NoteIndex
 from note.interfaces import INoteManager
-from note.models import Note
+from note.merkle import MerkleTree, note_hash
+from note.models import Attachment, Note, NoteSummary
+from note.utils import normalize_tags
 
 logger = logging.getLogger(__name__)
 
+RELOAD_ATTEMPTS = 3 # another process may be in the middle of writing the file, so we read it again
+RELOAD_RETRY_DELAY = 0.05 # seconds
 
 
 class InMemoryNoteManager(INoteManager):
@@ -19,25 +28,111 @@ class InMemoryNoteManager(INoteManager):
     def __init__(self) -> None:
         """Initializes with a dictionary."""
         self._notes: Dict[uuid.UUID, Note] = {}
+        self._tombstones: Dict[uuid.UUID, Note] = {} # deleted notes, kept so sync can spread deletions
         self._load_notes() # loads notes if exists any
+        self._rebuild_indexes()
         logger.info(f"{self.__class__.__name__} initialized.")
 
+    def _rebuild_indexes(self) -> None:
+        """Builds indexes of all notes from scratch(after loading)."""
+        # Display cache for list pages. Many commands never list notes, so summaries are built on the first
+        # list_note_summaries() call(not on every load) and updated on each write after that.
+        self._summaries: Optional[Dict[uuid.UUID, NoteSummary]] = None
+        self._index = NoteIndex() # secondary indexes(tags, metadata, times) for filtering
+        # Content hashes of notes for syncing with other stores. Only sync needs them, so the tree is built
+        # on the first get_merkle_tree() call(not on every load) and kept up to date after that.
+        self._merkle: Optional[MerkleTree] = None
+        self._index.add_all(self._notes.values()) # one sort per time index, not one insort per note
+
     def _load_notes(self) -> None:
         """Placeholder for loading notes."""
         pass # In-memory version doesn't need this
 
-    def _save_notes(self) -> None:
-        """Placeholder for saving notes."""
+    def _save_notes(self, note_ids: Iterable[uuid.UUID] = ()) -> None:
+        """Placeholder for saving notes(note_ids: notes which were changed or deleted)."""
+        pass # In-memory version doesn't need this
+
+    def flush(self) -> None:
+        """Writes pending changes to storage."""
         pass # In-memory version doesn't need this
 
-    def create_note(self, title: str, content: str) -> Note:
+    def _index_note(self, note: Note) -> None:
+        """Adds a note to the indexes and precomputes its summary for list pages."""
+        if self._summaries is not None:
+            self._summaries[note.id] = NoteSummary.from_note(note)
+        self._index.add(note)
+        self._hash_note(note)
+
+    def _unindex_note(self, note: Note) -> None:
+        """Removes a note from the indexes(before it is changed or deleted)."""
+        self._index.remove(note)
+        if self._summaries is not None:
+            self._summaries.pop(note.id, None)
+        self._unhash_note(note.id)
+
+    def create_note(
+        self,
+        title: str,
+        content: str,
+        tags: Optional[List[str]] = None,
+        metadata: Optional[Dict[str, str]] = None,
+    ) -> Note:
         """Creates a new note"""
-        new_note = Note(title=title, content=content)
+        new_note = Note(title=title, content=content, tags=tags or [], metadata=metadata or {})
         self._notes[new_note.id] = new_note
-        self._save_notes()
+        self._index_note(new_note)
+        self._save_notes([new_note.id])
         logger.info(f"Note created with ID: {new_note.id}")
         return new_note
 
+    def put_notes(self, notes: List[Note]) -> None:
+        """
+        Stores notes as they are(same IDs and timestamps), replacing older versions. Used by sync.
+        A tombstone(a note with `deleted_at`) deletes the note, a newer note brings a deleted one back.
+        """
+        for given_note in notes:
+            self._store_note(given_note.model_copy(deep=True)) # other stores may hold the same object
+        self._save_notes([note.id for note in notes]) # save once for all notes
+        logger.info(f"Stored {len(notes)} notes.")
+
+    def _store_note(self, note: Note) -> None:
+        """Replaces a note(or its tombstone) with the given version and updates indexes."""
+        old_note = self._notes.pop(note.id, None)
+        if old_note:
+            self._unindex_note(old_note)
+        if self._tombstones.pop(note.id, None):
+            self._unhash_note(note.id)
+
+        if note.deleted_at is None:
+            self._notes[note.id] = note
+            self._index_note(note)
+        else:
+            self._tombstones[note.id] = note
+            self._hash_note(note)
+
+    def get_notes_for_sync(self, note_ids: Iterable[uuid.UUID]) -> List[Note]:
+        """Retrieves notes by their IDs, tombstones of deleted notes included(missing ones are skipped)."""
+        notes = (self._notes.get(note_id) or self._tombstones.get(note_id) for note_id in note_ids)
+        return [note for note in notes if note]
+
+    def get_merkle_tree(self) -> MerkleTree:
+        """Returns Merkle tree of note hashes(built on first call, then kept up to date on every write)."""
+        if self._merkle is None:
+            self._merkle = MerkleTree()
+            for note in (*self._notes.values(), *self._tombstones.values()):
+                self._merkle.add(note.id, note_hash(note))
+        return self._merkle
+
+    def _hash_note(self, note: Note) -> None:
+        """Updates hash of a note(or tombstone) in the Merkle tree, if the tree was built."""
+        if self._merkle is not None:
+            self._merkle.add(note.id, note_hash(note))
+
+    def _unhash_note(self, note_id: uuid.UUID) -> None:
+        """Removes a note from the Merkle tree, if the tree was built."""
+        if self._merkle is not None:
+            self._merkle.remove(note_id)
+
     def get_note_by_id(self, note_id: uuid.UUID) -> Optional[Note]:
         """Retrieves a single note by its ID."""
         return self._notes.get(note_id)
@@ -46,27 +141,108 @@ class InMemoryNoteManager(INoteManager):
         """Returns a list of all notes."""
         return list(self._notes.values())
 
-    def update_note(self, note_id: uuid.UUID, title: str, content: str) -> Optional[Note]:
-        """Updates an existing note."""
+    def list_note_summaries(self, note_ids: Optional[Iterable[uuid.UUID]] = None) -> List[NoteSummary]:
+        """Returns precomputed display summaries of all notes(or just the given ones)."""
+        if self._summaries is None:
+            self._summaries = {note.id: NoteSummary.from_note(note) for note in self._notes.values()}
+        summaries = self._summaries
+        if note_ids is None:
+            note_ids = self._notes.keys()
+        return [summaries[note_id] for note_id in note_ids if note_id in summaries]
+
+    def filter_notes(
+        self,
+        tags: Optional[List[str]] = None,
+        metadata: Optional[Dict[str, str]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        time_field: str = "created_at",
+    ) -> List[Note]:
+        """Returns notes having all given tags and metadata, created(or updated) in [since, until)."""
+        note_ids = self._index.query(
+            tags=normalize_tags(tags), metadata=metadata, since=since, until=until, time_field=time_field
+        )
+        return [self._notes[note_id] for note_id in note_ids]
+
+    def count_tags(self, note_ids: Optional[Iterable[uuid.UUID]] = None) -> Dict[str, int]:
+        """Returns number of notes per tag(only among `note_ids` if given)."""
+        return self._index.tag_counts(note_ids)
+
+    def list_filtered_summaries(
+        self,
+        tags: Optional[List[str]] = None,
+        metadata: Optional[Dict[str, str]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        time_field: str = "created_at",
+    ) -> Tuple[List[NoteSummary], Dict[str, int]]:
+        """Returns summaries of matching notes(all notes without filters) and their tag counts(list pages use it)."""
+        note_ids = None # None means all notes
+        if tags or metadata or since or until:
+            note_ids = self._index.query(
+                tags=normalize_tags(tags), metadata=metadata, since=since, until=until, time_field=time_field
+            )
+        return self.list_note_summaries(note_ids), self.count_tags(note_ids)
+
+    def update_note(
+        self,
+        note_id: uuid.UUID,
+        title: str,
+        content: str,
+        tags: Optional[List[str]] = None,
+        metadata: Optional[Dict[str, str]] = None,
+    ) -> Optional[Note]:
+        """Updates an existing note. Tags and metadata are kept if they are not given."""
         note_to_update = self.get_note_by_id(note_id)
 
         if not note_to_update:
             logger.warning(f"Update failed: Note with ID {note_id} not found.")
             return None
 
+        self._unindex_note(note_to_update) # old values are needed to find index entries
         note_to_update.title = title
         note_to_update.content = content
+        if tags is not None:
+            note_to_update.tags = normalize_tags(tags)
+        if metadata is not None:
+            note_to_update.metadata = dict(metadata)
         note_to_update.updated_at = datetime.now(timezone.utc)
-        self._save_notes()
+        self._index_note(note_to_update)
+        self._save_notes([note_id])
         logger.info(f"Note with ID {note_id} updated.")
         return note_to_update
 
+    def add_attachment(self, note_id: uuid.UUID, attachment: Attachment) -> Optional[Note]:
+        """Adds attachment metadata to a note(a file with the same content is attached only once)."""
+        note = self.get_note_by_id(note_id)
+        if not note:
+            logger.warning(f"Attach failed: Note with ID {note_id} not found.")
+            return None
+
+        self._unindex_note(note)
+        note.attachments = [old for old in note.attachments if old.digest != attachment.digest] + [attachment]
+        note.updated_at = datetime.now(timezone.utc)
+        self._index_note(note)
+        self._save_notes([note_id])
+        logger.info(f"Attachment {attachment.digest} added to note {note_id}.")
+        return note
+
     def delete_note(self, note_id: uuid.UUID) -> bool:
         """Deletes a note by its ID."""
         if note_id in self._notes:
-            del self._notes[note_id]
+            # A tombstone(only ID and times) replaces the note, so other stores delete it on sync too.
+            deleted_at = datetime.now(timezone.utc)
+            note = self._notes[note_id]
+            self._store_note(Note(
+                id=note_id,
+                title="",
+                content="",
+                created_at=note.created_at,
+                updated_at=deleted_at,
+                deleted_at=deleted_at,
+            ))
             logger.info(f"Note with ID {note_id} deleted.")
-            self._save_notes()
+            self._save_notes([note_id])
             return True
 
         logger.warning(f"Delete failed: Note with ID {note_id} not found.")
@@ -112,32 +288,136 @@ class InMemoryNoteManager(INoteManager):
 
 class JsonNoteManager(InMemoryNoteManager):
     """JSON file storage for NoteManager."""
-    def __init__(self, db_path: Path) -> None:
+    def __init__(self, db_path: Path, *, autosave: bool = True) -> None:
+        """
+        autosave: save the file on every change. If it is False, changes are kept in memory
+        until `flush()` is called(long-living managers, like notebooks in web app, use it).
+        """
         self._db_path = db_path
+        self._autosave = autosave
+        self._dirty = False # unsaved changes(only when autosave is off)
+        self._pending: Set[uuid.UUID] = set() # IDs of notes changed since the last save
+        self._loaded_signature: Optional[Tuple[int, int]] = None
         self._db_path.touch(exist_ok=True) # Check if a Json file already exists
         super().__init__() # We SHOULD call the parent for initializing in-memory version first
 
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        """Modification time and size of the JSON file, to find out if someone else changed it."""
+        try:
+            stat = self._db_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def storage_size(self) -> int:
+        """Size of the JSON file in bytes."""
+        signature = self._file_signature()
+        return signature[1] if signature else 0
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reloads notes if the JSON file was changed by another process(e.g. CLI while web app is running).
+        Returns True if notes were reloaded. Unsaved changes are never thrown away, they are applied again.
+        """
+        if self._file_signature() == self._loaded_signature:
+            return False
+        self._merge_file_changes()
+        return True
+
+    def _merge_file_changes(self) -> None:
+        """
+        Loads the JSON file again(someone else changed it) and applies our unsaved changes on top of it,
+        so neither their notes nor ours are lost. If both sides changed the same note, ours wins.
+        A file which can't be parsed is never taken as an empty store(we would save only our changes over it).
+        """
+        file_notes = self._read_file_for_merge()
+        if file_notes is None: # the file was removed, so we keep what we have and save it again
+            return
+        ours = [self._notes.get(note_id) or self._tombstones.get(note_id) for note_id in self._pending]
+        self._notes = {}
+        self._tombstones = {}
+        self._place_notes(file_notes)
+        self._place_notes(note for note in ours if note is not None)
+        self._rebuild_indexes()
+        if ours:
+            logger.info(f"Merged {len(ours)} unsaved notes with changes in {self._db_path}.")
+
+    def _read_file_for_merge(self) -> Optional[List[Note]]:
+        """Reads the JSON file, retrying a few times if it is broken. Returns None if the file doesn't exist."""
+        for attempt in range(1, RELOAD_ATTEMPTS + 1):
+            try:
+                return self._read_file()
+            except FileNotFoundError:
+                return None
+            except json.JSONDecodeError as e:
+                if attempt == RELOAD_ATTEMPTS:
+                    msg = f"Could not read notes from {self._db_path} ({e}), it was not overwritten."
+                    raise StorageError(msg) from e
+                time.sleep(RELOAD_RETRY_DELAY)
+        return None # never reached, the last attempt returns or raises
+
+    def flush(self) -> None:
+        """Writes pending changes to the JSON file."""
+        if self._dirty:
+            self._write_file()
+
     def _load_notes(self) -> None:
         """Loads notes from the JSON file."""
         try:
-            with self._db_path.open("r") as f:
-                content = f.read()
-                if not content:
-                    return
-                notes_data = json.loads(content)
-                for note_data in notes_data:
-                    note = Note(**note_data)
-                    self._notes[note.id] = note
+            self._place_notes(self._read_file())
             logger.info(f"Loaded {len(self._notes)} notes from: \npath={self._db_path}.")
         except (json.JSONDecodeError, FileNotFoundError):
             logger.warning(f"Could not load notes from: \npath={self._db_path}.")
+            self._loaded_signature = self._file_signature()
             self._notes = {}
-
-    def _save_notes(self) -> None:
-        """Saves notes to the JSON file"""
-        notes_to_save = [note.model_dump(mode="json") for note in self._notes.values()]
-        with self._db_path.open("w") as f:
-            json.dump(notes_to_save, f, indent=4)
+            self._tombstones = {}
+
+    def _read_file(self) -> List[Note]:
+        """Parses all notes(tombstones too) of the JSON file. The file counts as loaded only if it is valid."""
+        signature = self._file_signature()
+        content = self._db_path.read_text()
+        notes = [Note(**note_data) for note_data in json.loads(content)] if content else []
+        self._loaded_signature = signature
+        return notes
+
+    def _place_notes(self, notes: Iterable[Note]) -> None:
+        """Puts loaded notes to notes or tombstones(a later note replaces an earlier one with the same ID)."""
+        for note in notes:
+            self._notes.pop(note.id, None)
+            self._tombstones.pop(note.id, None)
+            if note.deleted_at is None:
+                self._notes[note.id] = note
+            else:
+                self._tombstones[note.id] = note
+
+    def _save_notes(self, note_ids: Iterable[uuid.UUID] = ()) -> None:
+        """Saves notes to the JSON file(or just marks them as changed if autosave is off)."""
+        self._pending.update(note_ids)
+        if self._autosave:
+            self._write_file()
+        else:
+            self._dirty = True
+
+    def _write_file(self) -> None:
+        """Writes all notes to the JSON file(after merging changes someone else saved since we loaded it)."""
+        if self._file_signature() != self._loaded_signature:
+            self._merge_file_changes()
+        # Tombstones are saved with notes(they have `deleted_at`), so deletions survive until the next sync.
+        notes_to_save = [note.model_dump(mode="json") for note in (*self._notes.values(), *self._tombstones.values())]
+        # Written to a temp file and renamed, so other processes never read a half-written file.
+        fd, tmp_name = tempfile.mkstemp(dir=self._db_path.parent, prefix=f".{self._db_path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(notes_to_save, f, indent=4)
+            if self._db_path.exists():
+                shutil.copymode(self._db_path, tmp_name) # mkstemp makes owner-only files
+            os.replace(tmp_name, self._db_path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        self._dirty = False
+        self._pending.clear()
+        self._loaded_signature = self._file_signature() # our own write is not an external change
         logger.info(f"Saved {len(notes_to_save)} notes to {self._db_path}.")
 
 
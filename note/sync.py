@@ -0,0 +1,203 @@
+import json
+import logging
+import urllib.error
+import urllib.request
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from pydantic import BaseModel
+
+from note.exceptions import SyncError
+from note.interfaces import INoteManager, ISyncPeer
+from note.merkle import LEAF_PREFIX_LENGTH, note_hash
+from note.models import Note
+from note.services import JsonNoteManager
+
+logger = logging.getLogger(__name__)
+
+# A conflict policy gets the local and the remote version of a note and returns the one to keep.
+ConflictPolicy = Callable[[Note, Note], Note]
+
+
+def newest_wins(local: Note, remote: Note) -> Note:
+    """
+    Keeps the last updated version(ties are broken by hash, so both sides pick the same note).
+    A tombstone is updated when its note is deleted, so a deletion wins over older edits.
+    """
+    if (remote.updated_at, note_hash(remote)) > (local.updated_at, note_hash(local)):
+        return remote
+    return local
+
+def local_wins(local: Note, remote: Note) -> Note:  # noqa: ARG001
+    """Always keeps the local version."""
+    return local
+
+def remote_wins(local: Note, remote: Note) -> Note:  # noqa: ARG001
+    """Always keeps the remote version."""
+    return remote
+
+CONFLICT_POLICIES: Dict[str, ConflictPolicy] = {
+    "newest": newest_wins,
+    "local": local_wins,
+    "remote": remote_wins,
+}
+
+
+class SyncReport(BaseModel):
+    """What a sync did."""
+    pulled : int = 0 # notes copied from the other store
+    pushed : int = 0 # notes copied to the other store
+    conflicts : int = 0 # notes changed in both stores
+    round_trips : int = 0 # tree requests to the other store
+
+
+class LocalPeer(ISyncPeer):
+    """Another note store which is opened in this process(a notes.json path, or any manager)."""
+
+    def __init__(self, manager: INoteManager) -> None:
+        self._manager = manager
+
+    def root_hash(self) -> str:
+        """Returns root hash of the store's Merkle tree."""
+        return self._manager.get_merkle_tree().root_hash
+
+    def children_of(self, prefixes: Sequence[str]) -> Dict[str, Dict[str, str]]:
+        """Returns child hashes of the given Merkle tree nodes."""
+        return self._manager.get_merkle_tree().children_of(prefixes)
+
+    def get_notes(self, note_ids: Sequence[uuid.UUID]) -> List[Note]:
+        """Retrieves notes(or their tombstones) by their IDs(missing ones are skipped)."""
+        return self._manager.get_notes_for_sync(note_ids)
+
+    def put_notes(self, notes: List[Note]) -> None:
+        """Stores notes as they are."""
+        self._manager.put_notes(notes)
+
+
+class HttpPeer(ISyncPeer):
+    """A note store served by `note web`, reached through its /sync endpoints."""
+
+    def __init__(self, base_url: str, timeout: float = 30.0) -> None:
+        if not base_url.startswith(("http://", "https://")):
+            msg = f"Sync URL must start with http:// or https://, got '{base_url}'."
+            raise ValueError(msg)
+        self._base_url = base_url.rstrip("/")
+        self._timeout = timeout
+
+    def _request(self, method: str, path: str, payload: Optional[Any] = None) -> Any:
+        """Sends a JSON request and returns the decoded JSON response."""
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(  # noqa: S310 (scheme is checked in __init__)
+            self._base_url + path,
+            data=data,
+            method=method,
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self._timeout) as response:  # noqa: S310
+                return json.load(response)
+        except (urllib.error.URLError, ValueError) as e:
+            msg = f"Request to {self._base_url + path} failed: {e}"
+            raise SyncError(msg) from e
+
+    def root_hash(self) -> str:
+        """Returns root hash of the store's Merkle tree."""
+        return self._request("GET", "/sync/root")["root_hash"]
+
+    def children_of(self, prefixes: Sequence[str]) -> Dict[str, Dict[str, str]]:
+        """Returns child hashes of the given Merkle tree nodes."""
+        return self._request("POST", "/sync/tree", {"prefixes": list(prefixes)})
+
+    def get_notes(self, note_ids: Sequence[uuid.UUID]) -> List[Note]:
+        """Retrieves notes(or their tombstones) by their IDs(missing ones are skipped)."""
+        notes_data = self._request("POST", "/sync/notes/fetch", {"ids": [str(note_id) for note_id in note_ids]})
+        return [Note(**note_data) for note_data in notes_data]
+
+    def put_notes(self, notes: List[Note]) -> None:
+        """Stores notes as they are."""
+        self._request("POST", "/sync/notes", [note.model_dump(mode="json") for note in notes])
+
+
+def open_peer(other: str) -> ISyncPeer:
+    """Returns a peer for a web app URL or a path of another notes.json file(which must exist)."""
+    if other.startswith(("http://", "https://")):
+        return HttpPeer(other)
+    path = Path(other)
+    if not path.is_file(): # JsonNoteManager would create it, so a typo would copy every note to a new file
+        msg = f"'{other}' is not a notes file or an http(s) URL."
+        raise SyncError(msg)
+    return LocalPeer(JsonNoteManager(path))
+
+
+def sync_stores(
+    manager: INoteManager,
+    peer: ISyncPeer,
+    policy: ConflictPolicy = newest_wins,
+) -> SyncReport:
+    """
+    Two-way sync of a store with another one.
+    Both Merkle trees are walked level by level and only the differing subtrees are requested,
+    so the cost grows with the number of changed notes, not with the size of stores.
+    Deleted notes are synced as tombstones, so a deletion wins over older versions of the note
+    (and a newer edit wins over the deletion, with the default policy).
+    """
+    report = SyncReport(round_trips=1)
+    tree = manager.get_merkle_tree()
+    if tree.root_hash == peer.root_hash():
+        logger.info("Stores are already in sync.")
+        return report
+
+    # Walk down: root -> branches -> buckets -> note IDs, keeping only nodes whose hashes differ.
+    prefixes = [""]
+    only_local: List[str] = []
+    only_remote: List[str] = []
+    changed: List[str] = []
+    for depth in range(LEAF_PREFIX_LENGTH + 1):
+        mine = tree.children_of(prefixes)
+        theirs = peer.children_of(prefixes)
+        report.round_trips += 1
+        next_prefixes: List[str] = []
+        for prefix in prefixes:
+            local_children, remote_children = mine.get(prefix, {}), theirs.get(prefix, {})
+            for key in sorted(local_children.keys() | remote_children.keys()):
+                if local_children.get(key) == remote_children.get(key):
+                    continue
+                if depth < LEAF_PREFIX_LENGTH:
+                    next_prefixes.append(key)
+                elif key not in remote_children:
+                    only_local.append(key)
+                elif key not in local_children:
+                    only_remote.append(key)
+                else:
+                    changed.append(key)
+        prefixes = next_prefixes
+        if not prefixes:
+            break
+
+    remote_notes = {note.id: note for note in peer.get_notes([uuid.UUID(key) for key in only_remote + changed])}
+    local_notes = {note.id: note for note in manager.get_notes_for_sync(uuid.UUID(key) for key in only_local + changed)}
+    to_local: List[Note] = [remote_notes[uuid.UUID(key)] for key in only_remote if uuid.UUID(key) in remote_notes]
+    to_remote: List[Note] = [local_notes[uuid.UUID(key)] for key in only_local if uuid.UUID(key) in local_notes]
+
+    for key in changed:
+        local_note = local_notes.get(uuid.UUID(key))
+        remote_note = remote_notes.get(uuid.UUID(key))
+        if local_note is None or remote_note is None:
+            continue
+        report.conflicts += 1
+        winner = policy(local_note, remote_note)
+        winner_hash = note_hash(winner)
+        if winner_hash != note_hash(local_note):
+            to_local.append(winner)
+        if winner_hash != note_hash(remote_note):
+            to_remote.append(winner)
+
+    if to_local:
+        manager.put_notes(to_local)
+    if to_remote:
+        peer.put_notes(to_remote)
+
+    report.pulled, report.pushed = len(to_local), len(to_remote)
+    logger.info(f"Sync done: {report.pulled} pulled, {report.pushed} pushed, {report.conflicts} conflicts.")
+    return report
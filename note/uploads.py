@@ -0,0 +1,113 @@
+import logging
+from types import TracebackType
+from typing import Dict, Optional, Tuple, Type
+
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from note.blobs import BlobStore, BlobWriter
+
+logger = logging.getLogger(__name__)
+
+
+class MultipartBlobUpload:
+    """
+    Streams the file field of a `multipart/form-data` body straight into the blob store.
+    Starlette's form parser spools uploads to a temp file first, so each upload would be written twice.
+    Feed it the raw body chunk by chunk with `write()`, then call `finish()`. Other fields are ignored.
+    """
+
+    def __init__(self, store: BlobStore, content_type_header: str, field: str = "file") -> None:
+        content_type, options = parse_options_header(content_type_header)
+        if content_type != b"multipart/form-data" or not options.get(b"boundary"):
+            msg = "Upload must be sent as multipart/form-data."
+            raise ValueError(msg)
+
+        self._store = store
+        self._field = field.encode()
+        self._writer: Optional[BlobWriter] = None # only while the file part is being read
+        self._result: Optional[Tuple[str, int]] = None
+        self._ended = False
+        self.filename = ""
+        self.content_type = "application/octet-stream"
+
+        # Headers of the current part
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+
+        self._parser = MultipartParser(options[b"boundary"], callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_end": self._on_end,
+        })
+
+    def write(self, chunk: bytes) -> None:
+        """Parses a chunk of the body, file data goes to the blob writer."""
+        self._parser.write(chunk)
+
+    def finish(self) -> Tuple[str, int]:
+        """Checks that the body was complete and returns digest and size of the stored file."""
+        self._parser.finalize()
+        if not self._ended:
+            msg = "Upload body is incomplete."
+            raise ValueError(msg)
+        if self._result is None:
+            msg = f"Upload has no '{self._field.decode()}' file."
+            raise ValueError(msg)
+        return self._result
+
+    def abort(self) -> None:
+        """Drops a half-written file."""
+        if self._writer is not None:
+            self._writer.abort()
+            self._writer = None
+
+    def __enter__(self) -> "MultipartBlobUpload":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.abort() # nothing to drop after a complete upload
+
+    # Parser callbacks:
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field, self._header_value = b"", b""
+
+    def _on_headers_finished(self) -> None:
+        _, disposition = parse_options_header(self._headers.get(b"content-disposition", b""))
+        is_file = disposition.get(b"name") == self._field and b"filename" in disposition
+        if is_file and self._result is None: # the first file wins
+            self.filename = disposition[b"filename"].decode("utf-8", errors="replace")
+            self.content_type = self._headers.get(b"content-type", b"").decode("latin-1") or self.content_type
+            self._writer = self._store.writer()
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._writer is not None:
+            self._writer.write(data[start:end])
+
+    def _on_part_end(self) -> None:
+        if self._writer is not None:
+            self._result = self._writer.commit()
+            self._writer = None
+
+    def _on_end(self) -> None:
+        self._ended = True
@@ -1,2 +1,91 @@
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional
 
+SNIPPET_LENGTH = 50 # How many characters of content should be displayed in lists?
+SNIPPET_LEEWAY = 5 # Same tolerance as Jinja's `truncate` filter
+LIST_TIME_FORMAT = "%Y-%m-%d %H:%M"
+DETAIL_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+BYTES_PER_KB = 1024
+STREAM_CHUNK_SIZE = 32 * 1024 # characters per chunk of streamed pages
 
+
+def make_snippet(text: str, length: int = SNIPPET_LENGTH, end: str = "...") -> str:
+    """
+    Builds a one-line preview of a text.
+    It behaves exactly like `text | replace('\\n', ' ') | truncate(length)` in Jinja,
+    but we run it once per write instead of once per render.
+    """
+    one_line = text.replace("\n", " ") # Newlines break tables, so we remove them
+    if len(one_line) <= length + SNIPPET_LEEWAY:
+        return one_line
+
+    # Do not cut a word in half, drop the last (partial) word instead.
+    return one_line[: length - len(end)].rsplit(" ", 1)[0] + end
+
+
+def format_timestamp(moment: datetime, fmt: str = LIST_TIME_FORMAT) -> str:
+    """Formats a datetime for displaying to users."""
+    return moment.strftime(fmt)
+
+
+def format_size(size: int) -> str:
+    """Formats a number of bytes for humans, e.g. 1536 -> '1.5 KB'."""
+    if size < BYTES_PER_KB:
+        return f"{size} B"
+    amount = size / BYTES_PER_KB
+    for unit in ("KB", "MB"):
+        if amount < BYTES_PER_KB:
+            return f"{amount:.1f} {unit}"
+        amount /= BYTES_PER_KB
+    return f"{amount:.1f} GB"
+
+
+def group_chunks(pieces: Iterable[str], size: int = STREAM_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Joins small pieces of text(e.g. `template.generate()` yields one per template node) into chunks of
+    about `size` characters, so a streamed response is sent in a few sends instead of one per piece.
+    """
+    buffer: List[str] = []
+    buffered = 0
+    for piece in pieces:
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= size:
+            yield "".join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def as_utc(moment: datetime) -> datetime:
+    """Notes are stored in UTC, so naive datetimes(e.g. from `--since 2026-01-01`) are treated as UTC."""
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment
+
+
+def normalize_tags(tags: Optional[Iterable[str]]) -> List[str]:
+    """Lower-cases and strips tags, drops empty and duplicate ones(order is kept)."""
+    cleaned: List[str] = []
+    for raw_tag in tags or []:
+        tag = raw_tag.strip().lower()
+        if tag and tag not in cleaned:
+            cleaned.append(tag)
+    return cleaned
+
+
+def split_tags(text: str) -> List[str]:
+    """Splits a comma separated text(like web forms input) to tags."""
+    return normalize_tags(text.split(","))
+
+
+def parse_key_values(items: Optional[Iterable[str]]) -> Dict[str, str]:
+    """Parses `key=value` strings to a dictionary."""
+    pairs: Dict[str, str] = {}
+    for item in items or []:
+        key, separator, value = item.partition("=")
+        if not separator or not key.strip():
+            msg = f"Metadata must be in 'key=value' format, got '{item}'."
+            raise ValueError(msg)
+        pairs[key.strip()] = value.strip()
+    return pairs
@@ -1,86 +1,235 @@
 import importlib.resources  # No Relative path should use for Pypi, This solves the problem.
 import uuid
+from contextlib import asynccontextmanager
+from datetime import date, datetime, time, timezone
 from functools import lru_cache
+from typing import AsyncIterator, Dict, List, Optional
 
 from fastapi import (
+    APIRouter,
+    Body,
     Depends,  # We need depends so CLI and Web can work on the same json file at the same time for HotReload
     FastAPI,
     Form,
     HTTPException,
+    Query,
     Request,
+    Response,
 )
-from fastapi.responses import RedirectResponse
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
+from starlette.concurrency import run_in_threadpool
 
+from note.blobs import BlobStore
+from note.exceptions import NotebookNotFoundError
 from note.interfaces import INoteManager
+from note.models import Attachment, Note
+from note.pool import NotebookPool
 from note.services import InMemoryNoteManager, JsonNoteManager
+from note.uploads import MultipartBlobUpload
+from note.utils import group_chunks, split_tags
 from settings import StorageType, settings
 
 templates_path = str(importlib.resources.files("note").joinpath("templates")) # No Relative path should use for Pypi.
-templates = Jinja2Templates(directory=templates_path)
+
+
+def build_templates() -> Jinja2Templates:
+    """
+    Creates the Jinja2 templates of web app.
+    Compiled templates are kept in Jinja's bytecode cache(a temp directory per user), because
+    site-packages may be read-only. So new workers don't parse and compile templates again.
+    """
+    jinja_templates = Jinja2Templates(directory=templates_path)
+    jinja_templates.env.bytecode_cache = FileSystemBytecodeCache()
+    return jinja_templates
+
+
+templates = build_templates()
 
 # Instead of using Global variables, We should Singleton:
 @lru_cache(maxsize=1) # Load and cache just one time in each programs start-up.
 def get_singleton_manager() -> INoteManager:
     """
     What we are actually doing? :)
-    We only need to load In-Memory or SQL manager once! So we cache them, by this function.
+    We only need to load a manager once! So we cache them, by this function.
+    Json manager is cached too, so its summaries and indexes survive between requests.
+    It reloads the file when CLI changes it(see get_manager).
     """
     # After SQL implementation we should uncomment these:
     # if settings.STORAGE_TYPE == StorageType.SQL:
     #     return SQLNoteManager(...)
-    # else:
+    if settings.STORAGE_TYPE == StorageType.JSON:
+        return JsonNoteManager(db_path=settings.DB_PATH)
     return InMemoryNoteManager() # We don't have sql, so we just cache and return In-Memory Manager.
 
 
-def get_manager() -> INoteManager:
-    """This function chooses which manager should be loaded, based on settings!"""
-    # For Json, We should not cache! so in each CRUD function, CLI and Web can work on json file at the same time!
-    if settings.STORAGE_TYPE == StorageType.JSON:
-        return JsonNoteManager(db_path=settings.DB_PATH)
+@lru_cache(maxsize=1)
+def get_notebook_pool() -> NotebookPool:
+    """Pool of notebook managers(for /nb/{notebook}/... routes), loaded on demand."""
+    return NotebookPool(
+        settings.NOTEBOOKS_PATH,
+        max_open=settings.NOTEBOOK_POOL_SIZE,
+        max_bytes=settings.NOTEBOOK_POOL_MAX_BYTES,
+        autosave=settings.NOTEBOOK_AUTOSAVE
+    )
+
+
+@asynccontextmanager
+async def _provide_manager(
+    request: Request, *, create: bool, missing_as_empty: bool = False
+) -> AsyncIterator[INoteManager]:
+    """
+    Chooses which manager should be used for a request, based on settings and the URL.
+    It runs on the event loop like our routes, so it never reloads a manager while a route reads it.
+    missing_as_empty: a missing notebook is served as an empty store(and not created), instead of 404.
+    """
+    # Notebook routes(/nb/{notebook}/...) use the pool, which keeps hot notebooks loaded.
+    # The notebook is pinned until the request ends, so the pool can't close it while the route still writes to it.
+    notebook = request.path_params.get("notebook")
+    if notebook is not None:
+        pool = get_notebook_pool()
+        try:
+            manager = pool.acquire(notebook, create=create)
+        except NotebookNotFoundError as e:
+            if not missing_as_empty:
+                raise HTTPException(status_code=404, detail=str(e)) from e
+            manager = None
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e)) from e
+        if manager is None:
+            yield InMemoryNoteManager()
+            return
+        try:
+            yield manager
+        finally:
+            pool.release(notebook)
+        return
+
+    # We use the cached instance. For Json, CLI and Web can work on the json file at the same time,
+    # so the file is loaded again only if CLI changed it since the last request.
+    manager = get_singleton_manager()
+    if isinstance(manager, JsonNoteManager):
+        manager.reload_if_changed()
+    yield manager
 
-    # For other types, we use cached singleton instance(In-Memory for now).
-    return get_singleton_manager()
+async def get_manager(request: Request) -> AsyncIterator[INoteManager]:
+    """This function chooses which manager should be loaded, based on settings! Missing notebooks are 404."""
+    async with _provide_manager(request, create=False) as manager:
+        yield manager
+
+async def get_manager_for_writes(request: Request) -> AsyncIterator[INoteManager]:
+    """Like get_manager, but a missing notebook is created(for routes which add notes)."""
+    async with _provide_manager(request, create=True) as manager:
+        yield manager
+
+async def get_manager_for_sync(request: Request) -> AsyncIterator[INoteManager]:
+    """
+    Like get_manager, but a missing notebook is an empty store. So `note sync` can compare with it and push
+    notes to a new notebook(the push, through get_manager_for_writes, creates it).
+    """
+    async with _provide_manager(request, create=False, missing_as_empty=True) as manager:
+        yield manager
+
+def get_blob_store() -> BlobStore:
+    """Attachments storage, based on settings."""
+    return BlobStore(settings.BLOBS_PATH)
+
+def _base_url(request: Request) -> str:
+    """URL prefix of current notebook("" for the default one), so links and redirects stay in it."""
+    notebook = request.path_params.get("notebook")
+    return f"/nb/{notebook}" if notebook is not None else ""
+
+def _parse_day(value: Optional[str]) -> Optional[date]:
+    """Parses a date of query string. The filter form sends empty inputs as "", which means no filter."""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid date '{value}', use YYYY-MM-DD.") from e
+
+def _start_of_day(day: Optional[date]) -> Optional[datetime]:
+    """Converts a date of query string to a UTC datetime."""
+    return datetime.combine(day, time.min, tzinfo=timezone.utc) if day else None
 
 def create_app() -> FastAPI:
     """Main function to create the FastAPI application."""
 
-    app = FastAPI(title="Note Manager Web")
+    @asynccontextmanager
+    async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+        """Flushes open notebooks when the server stops."""
+        yield
+        get_notebook_pool().close()
+
+    app = FastAPI(title="Note Manager Web", lifespan=lifespan)
+
+    # Every route is served twice: /notes/... for the default notes and /nb/{notebook}/notes/... for notebooks.
+    router = APIRouter()
 
     # This line solves `python -m note` no template found problem, if user install Note App from Pypi
-    templates = Jinja2Templates(directory=templates_path)
+    templates = build_templates()
 
     @app.get("/")
     async def root():
         """Redirects the root URL to /notes."""
         return RedirectResponse(url="/notes")
 
-    @app.get("/notes") # We should not use a function as another functions input parameters, but it's ok in fastAPI!
-    async def list_notes(request: Request, manager: INoteManager = Depends(get_manager)):  # noqa: B008
-        """Lists all notes."""
-        all_notes = manager.list_all_notes()
+    @app.get("/nb/{notebook}")
+    async def notebook_root(notebook: str):
+        """Redirects a notebook URL to its notes."""
+        return RedirectResponse(url=f"/nb/{notebook}/notes")
 
-        return templates.TemplateResponse(
-            "index.html",
-            {"request": request, "notes": all_notes}
+    @router.get("/notes") # We should not use a function as another functions input parameters, but it's ok in fastAPI!
+    async def list_notes(
+        request: Request,
+        tag: List[str] = Query(default=[]),  # noqa: B008
+        since: Optional[str] = None, # str, because the filter form sends empty dates as ""
+        until: Optional[str] = None,
+        manager: INoteManager = Depends(get_manager)  # noqa: B008
+    ):
+        """Lists all notes(or filter them by tags and dates, e.g. /notes?tag=work&since=2026-01-01)."""
+        since_day, until_day = _parse_day(since), _parse_day(until)
+        # Snippets and dates are already formatted by manager, tag counts are facets of listed notes.
+        summaries, tag_counts = manager.list_filtered_summaries(
+            tags=tag, since=_start_of_day(since_day), until=_start_of_day(until_day)
+        )
+
+        # generate() yields the page piece by piece, so we don't build the whole HTML in memory.
+        # Pieces are tiny(one per template node), so they are grouped into ~32 KB chunks before sending.
+        template = templates.get_template("index.html")
+        return StreamingResponse(
+            group_chunks(template.generate(
+                request=request,
+                notes=summaries,
+                tag_counts=tag_counts,
+                selected_tags=tag,
+                base=_base_url(request),
+                since=since_day,
+                until=until_day
+            )),
+            media_type="text/html"
         )
 
-    @app.get("/notes/create")
+    @router.get("/notes/create")
     async def create_note_form(request: Request):
         """Displays the form to create a new note."""
-        return templates.TemplateResponse("create_note.html", {"request": request})
+        return templates.TemplateResponse(request, "create_note.html", {"base": _base_url(request)})
 
-    @app.post("/notes/create")
+    @router.post("/notes/create")
     async def create_note(
+        request: Request,
         title: str = Form(...),
         content: str = Form(...),
-        manager: INoteManager = Depends(get_manager)  # noqa: B008
+        tags: str = Form(""), # comma separated
+        manager: INoteManager = Depends(get_manager_for_writes)  # noqa: B008
     ):
         """submit button of the creation form"""
-        manager.create_note(title=title, content=content)
-        return RedirectResponse(url="/notes", status_code=303) # status_code 303 is important for POST redirects
+        manager.create_note(title=title, content=content, tags=split_tags(tags))
+        # status_code 303 is important for POST redirects
+        return RedirectResponse(url=f"{_base_url(request)}/notes", status_code=303)
 
-    @app.get("/notes/{note_id}")
+    @router.get("/notes/{note_id}")
     async def read_note(
         request: Request,
         note_id: uuid.UUID,
@@ -92,29 +241,137 @@ def create_app() -> FastAPI:
             raise HTTPException(status_code=404, detail="Note not found")
 
         return templates.TemplateResponse(
+            request,
             "note_detail.html",
-            {"request": request, "note": note}
+            {"note": note, "base": _base_url(request)}
         )
 
-    @app.post("/notes/{note_id}/edit")
-    async def update_note(
+    @router.post("/notes/{note_id}/edit")
+    async def update_note(  # noqa: PLR0917 (FastAPI fills the parameters)
+        request: Request,
         note_id: uuid.UUID,
         title: str = Form(...),
         content: str = Form(...),
+        tags: str = Form(""), # comma separated
         manager: INoteManager = Depends(get_manager)  # noqa: B008
     ):
         """Edit button process"""
-        updated_note = manager.update_note(note_id=note_id, title=title, content=content)
+        updated_note = manager.update_note(note_id=note_id, title=title, content=content, tags=split_tags(tags))
         if not updated_note:
             raise HTTPException(status_code=404, detail="Note not found for update")
-        return RedirectResponse(url=f"/notes/{note_id}", status_code=303)
+        return RedirectResponse(url=f"{_base_url(request)}/notes/{note_id}", status_code=303)
 
-    @app.post("/notes/{note_id}/delete")
-    async def delete_note(note_id: uuid.UUID, manager: INoteManager = Depends(get_manager)):  # noqa: B008
+    @router.post("/notes/{note_id}/delete")
+    async def delete_note(
+        request: Request,
+        note_id: uuid.UUID,
+        manager: INoteManager = Depends(get_manager)  # noqa: B008
+    ):
         """Delete button process."""
         success = manager.delete_note(note_id)
         if not success:
             raise HTTPException(status_code=404, detail="Note not found for deletion")
-        return RedirectResponse(url="/notes", status_code=303)
+        return RedirectResponse(url=f"{_base_url(request)}/notes", status_code=303)
+
+    @router.post("/notes/{note_id}/attachments")
+    async def upload_attachment(
+        request: Request,
+        note_id: uuid.UUID,
+        manager: INoteManager = Depends(get_manager),  # noqa: B008
+        blobs: BlobStore = Depends(get_blob_store)  # noqa: B008
+    ):
+        """
+        Upload button process. The multipart body is parsed while it arrives and the file goes straight
+        to the blob store, so it is written to disk once and never loaded in memory completely.
+        """
+        if not manager.get_note_by_id(note_id):
+            raise HTTPException(status_code=404, detail="Note not found for attachment")
+
+        try:
+            with MultipartBlobUpload(blobs, request.headers.get("content-type", "")) as upload:
+                async for chunk in request.stream():
+                    await run_in_threadpool(upload.write, chunk) # disk writes should not block the event loop
+                digest, size = await run_in_threadpool(upload.finish)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+
+        attachment = Attachment(
+            filename=upload.filename or digest,
+            digest=digest,
+            size=size,
+            content_type=upload.content_type
+        )
+        if not manager.add_attachment(note_id, attachment): # the note was deleted while the file was uploading
+            raise HTTPException(status_code=404, detail="Note not found for attachment")
+        return RedirectResponse(url=f"{_base_url(request)}/notes/{note_id}", status_code=303)
+
+    @router.get("/notes/{note_id}/attachments/{digest}")
+    async def download_attachment(
+        request: Request,
+        note_id: uuid.UUID,
+        digest: str,
+        manager: INoteManager = Depends(get_manager),  # noqa: B008
+        blobs: BlobStore = Depends(get_blob_store)  # noqa: B008
+    ):
+        """Downloads an attachment(supports Range requests, uses sendfile/pathsend when server has it)."""
+        note = manager.get_note_by_id(note_id)
+        attachment = next((item for item in note.attachments if item.digest == digest), None) if note else None
+        if not attachment:
+            raise HTTPException(status_code=404, detail="Attachment not found")
+
+        # Content never changes for a digest, so the digest is a strong ETag and the file can be cached forever.
+        etag = f'"{digest}"'
+        headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+
+        blob_path = blobs.path_for(digest)
+        if not blob_path.is_file():
+            raise HTTPException(status_code=404, detail="Attachment file is missing")
+
+        return FileResponse(
+            blob_path,
+            media_type=attachment.content_type,
+            filename=attachment.filename,
+            headers=headers
+        )
+
+    # Sync endpoints: `note sync http://host:port` talks to these(see note/sync.py).
+    @router.get("/sync/root")
+    async def sync_root(manager: INoteManager = Depends(get_manager_for_sync)):  # noqa: B008
+        """Root hash of the Merkle tree."""
+        return {"root_hash": manager.get_merkle_tree().root_hash}
+
+    @router.post("/sync/tree")
+    async def sync_tree(
+        prefixes: List[str] = Body(..., embed=True),  # noqa: B008
+        manager: INoteManager = Depends(get_manager_for_sync)  # noqa: B008
+    ) -> Dict[str, Dict[str, str]]:
+        """Child hashes of the requested Merkle tree nodes."""
+        try:
+            return manager.get_merkle_tree().children_of(prefixes)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e)) from e
+
+    @router.post("/sync/notes/fetch")
+    async def sync_fetch_notes(
+        ids: List[uuid.UUID] = Body(..., embed=True),  # noqa: B008
+        manager: INoteManager = Depends(get_manager_for_sync)  # noqa: B008
+    ) -> List[Note]:
+        """Full notes(or tombstones of deleted ones) for the requested IDs(missing ones are skipped)."""
+        return manager.get_notes_for_sync(ids)
+
+    @router.post("/sync/notes")
+    async def sync_put_notes(
+        notes: List[Note],
+        manager: INoteManager = Depends(get_manager_for_writes)  # noqa: B008
+    ):
+        """Stores notes sent by another store."""
+        manager.put_notes(notes)
+        return {"stored": len(notes)}
+
+    app.include_router(router)
+    app.include_router(router, prefix="/nb/{notebook}")
 
     return app
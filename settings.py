@@ -1,5 +1,6 @@
 from enum import Enum
 from pathlib import Path
+from typing import Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -18,6 +19,13 @@ class Settings(BaseSettings):
     # And if .env was not there:
     STORAGE_TYPE: StorageType = StorageType.JSON # Type of Storage
     DB_PATH: Path = Path("notes.json") # Json file location
+    BLOBS_PATH: Path = Path("blobs") # Attachments directory(content-addressed)
+
+    # Notebooks(/nb/{name}/notes in web app, `note --notebook NAME` in CLI):
+    NOTEBOOKS_PATH: Path = Path("notebooks") # Each notebook is a Json file in this directory
+    NOTEBOOK_POOL_SIZE: int = 32 # How many notebooks can be loaded at the same time?
+    NOTEBOOK_POOL_MAX_BYTES: Optional[int] = None # Budget for total size of loaded notebooks(None: no limit)
+    NOTEBOOK_AUTOSAVE: bool = True # If False, notebooks are saved when they are closed(or on shutdown)
 
     # or SQL:
     # STORAGE_TYPE: StorageType = StorageType.SQL
@@ -0,0 +1,72 @@
+import hashlib
+from pathlib import Path
+
+import pytest
+
+from note.blobs import BlobStore
+from note.uploads import MultipartBlobUpload
+
+
+@pytest.fixture
+def blob_store(tmp_path: Path) -> BlobStore:
+    """BlobStore in a temporary directory."""
+    return BlobStore(tmp_path / "blobs")
+
+def test_put_stream_is_content_addressed(blob_store: BlobStore):
+    """Blobs are stored under their SHA-256 digest, in sharded directories."""
+    digest, size = blob_store.put_stream([b"hello ", b"world"])
+    assert digest == hashlib.sha256(b"hello world").hexdigest()
+    assert size == 11
+    path = blob_store.path_for(digest)
+    assert path.parts[-3:] == (digest[:2], digest[2:4], digest)
+    assert path.read_bytes() == b"hello world"
+
+def test_same_content_is_stored_once(blob_store: BlobStore, tmp_path: Path):
+    """Uploading the same content again does not create another file."""
+    source = tmp_path / "file.txt"
+    source.write_bytes(b"same content")
+    first = blob_store.put_file(source)
+    second = blob_store.put_stream([b"same ", b"content"])
+    assert first == second
+    assert len([path for path in (tmp_path / "blobs").rglob("*") if path.is_file()]) == 1
+    assert list(blob_store.tmp_path.iterdir()) == []
+
+def test_failed_write_leaves_nothing(blob_store: BlobStore):
+    """Half-written blobs are removed when writing fails."""
+    def broken_chunks():
+        yield b"part"
+        msg = "disk is gone"
+        raise OSError(msg)
+
+    with pytest.raises(OSError):
+        blob_store.put_stream(broken_chunks())
+    assert list(blob_store.tmp_path.iterdir()) == []
+
+def test_invalid_digest(blob_store: BlobStore):
+    """Digests are validated, so they can't be used to escape the store directory."""
+    with pytest.raises(ValueError):
+        blob_store.path_for("../../etc/passwd")
+    assert not blob_store.exists("0" * 64)
+
+def test_multipart_upload_in_small_chunks(blob_store: BlobStore):
+    """The file field is stored while the body arrives, however the body is split."""
+    body = (
+        b'--b\r\nContent-Disposition: form-data; name="note"\r\n\r\nignored\r\n'
+        b'--b\r\nContent-Disposition: form-data; name="file"; filename="a.txt"\r\n'
+        b"Content-Type: text/plain\r\n\r\nhello world\r\n--b--\r\n"
+    )
+    with MultipartBlobUpload(blob_store, "multipart/form-data; boundary=b") as upload:
+        for i in range(0, len(body), 3):
+            upload.write(body[i:i + 3])
+        digest, size = upload.finish()
+    assert (upload.filename, upload.content_type, size) == ("a.txt", "text/plain", 11)
+    assert blob_store.path_for(digest).read_bytes() == b"hello world"
+
+def test_incomplete_multipart_upload(blob_store: BlobStore):
+    """A cut body is refused and its half-written file is dropped."""
+    with pytest.raises(ValueError), MultipartBlobUpload(blob_store, "multipart/form-data; boundary=b") as upload:
+        upload.write(b'--b\r\nContent-Disposition: form-data; name="file"; filename="a.txt"\r\n\r\nhalf')
+        upload.finish()
+    assert list(blob_store.tmp_path.iterdir()) == []
+    with pytest.raises(ValueError):
+        MultipartBlobUpload(blob_store, "application/json")
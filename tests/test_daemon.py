@@ -0,0 +1,103 @@
+import json
+import threading
+import time
+import uuid
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from note.daemon import DaemonNoteManager, NoteDaemon, daemon_supported
+from note.exceptions import DaemonError, NoteNotFoundError
+from note.services import JsonNoteManager
+from settings import settings
+
+pytestmark = pytest.mark.skipif(not daemon_supported(), reason="Unix domain sockets are not supported")
+
+
+def _start_daemon(tmp_path: Path):
+    """Starts a daemon serving tmp_path/notes.json in a background thread and waits until it listens."""
+    socket_path = tmp_path / "d.sock"
+    note_daemon = NoteDaemon(socket_path, db_path=tmp_path / "notes.json", notebooks_path=tmp_path / "notebooks")
+    thread = threading.Thread(target=note_daemon.serve_forever, daemon=True)
+    thread.start()
+    for _ in range(100):
+        if DaemonNoteManager.connect(socket_path):
+            break
+        time.sleep(0.05)
+    return note_daemon, thread, socket_path
+
+@pytest.fixture
+def running_daemon(tmp_path: Path):
+    """A daemon serving tmp_path/notes.json in a background thread."""
+    note_daemon, thread, socket_path = _start_daemon(tmp_path)
+    yield socket_path
+    note_daemon.shutdown()
+    thread.join(timeout=5)
+
+def test_client_round_trip(running_daemon: Path, tmp_path: Path):
+    """Calls are served by the daemon and saved to the Json file."""
+    client = DaemonNoteManager.connect(running_daemon)
+    note = client.create_note("Daemon", "Served from memory", tags=["work"])
+    assert client.find_note_by_prefix(str(note.id)[:8]).title == "Daemon"
+    assert [found.id for found in client.search_notes("memory")] == [note.id]
+    assert [found.id for found in client.filter_notes(tags=["work"])] == [note.id]
+    assert client.count_tags() == {"work": 1}
+    assert client.list_note_summaries()[0].snippet == "Served from memory"
+    client.create_note("Other", "...", tags=["home"])
+    with patch.object(client, "_send", wraps=client._send) as sent:
+        summaries, tag_counts = client.list_filtered_summaries(tags=["work"])
+    assert sent.call_count == 1 # summaries and tag counts in one round trip
+    assert ([summary.id for summary in summaries], tag_counts) == ([note.id], {"work": 1})
+    assert JsonNoteManager(tmp_path / "notes.json").get_note_by_id(note.id) is not None
+
+    with pytest.raises(NoteNotFoundError):
+        client.find_note_by_prefix("xxxxxxxx")
+    assert client.get_note_by_id(uuid.uuid4()) is None
+    assert client.delete_note(note.id) is True
+
+def test_daemon_sees_direct_changes(running_daemon: Path, tmp_path: Path):
+    """Changes made without the daemon(e.g. with --no-daemon) are reloaded."""
+    client = DaemonNoteManager.connect(running_daemon)
+    client.list_all_notes()
+    note = JsonNoteManager(tmp_path / "notes.json").create_note("Direct", "...")
+    assert client.get_note_by_id(note.id) is not None
+
+def test_notebooks_through_daemon(running_daemon: Path, tmp_path: Path):
+    """Each notebook has its own manager in the daemon."""
+    work = DaemonNoteManager.connect(running_daemon, notebook="work")
+    work.create_note("Work note", "...")
+    assert DaemonNoteManager.connect(running_daemon).list_all_notes() == []
+    assert (tmp_path / "notebooks" / "work.json").exists()
+
+def test_client_falls_back_when_daemon_stops(tmp_path: Path):
+    """If the daemon goes away during a command, calls are served by the Json file(or fail cleanly)."""
+    note_daemon, thread, socket_path = _start_daemon(tmp_path)
+    db_path = tmp_path / "notes.json"
+    client = DaemonNoteManager.connect(socket_path, fallback=lambda: JsonNoteManager(db_path))
+    bare_client = DaemonNoteManager.connect(socket_path)
+    note = client.create_note("Before", "...")
+    note_daemon.shutdown()
+    thread.join(timeout=5)
+
+    assert client.get_note_by_id(note.id).title == "Before"
+    assert client.create_note("After", "...").title == "After" # never reached the daemon, safe to do on the file
+    assert len(JsonNoteManager(db_path).list_all_notes()) == 2
+    with pytest.raises(DaemonError):
+        bare_client.list_all_notes()
+
+def test_connect_without_daemon(tmp_path: Path):
+    """Without a running daemon, connect returns None so CLI falls back to the Json file."""
+    assert DaemonNoteManager.connect(tmp_path / "missing.sock") is None
+    (tmp_path / "stale.sock").touch()
+    assert DaemonNoteManager.connect(tmp_path / "stale.sock") is None
+
+def test_daemon_pool_uses_settings(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    """The daemon's notebook pool has the same limits as the web app's."""
+    monkeypatch.setattr(settings, "NOTEBOOK_POOL_SIZE", 2)
+    monkeypatch.setattr(settings, "NOTEBOOK_POOL_MAX_BYTES", 4096)
+    note_daemon = NoteDaemon(tmp_path / "d.sock", db_path=tmp_path / "notes.json", notebooks_path=tmp_path)
+    for name in ("a", "b", "c"):
+        request = {"method": "create_note", "params": {"title": "x", "content": "..."}, "notebook": name}
+        assert note_daemon.dispatch(json.dumps(request).encode())["ok"]
+    assert note_daemon._pool.open_notebooks() == ["b", "c"]
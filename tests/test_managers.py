@@ -1,11 +1,14 @@
 import uuid
+from datetime import datetime, timedelta, timezone
 from unittest.mock import patch
 
 import pytest
 
-from note.exceptions import NoteNotFoundError, NotUniqueIDError
+from note.exceptions import NoteNotFoundError, NotUniqueIDError, StorageError
 from note.interfaces import INoteManager
-from note.models import Note
+from note.merkle import note_hash
+from note.models import Attachment, Note, NoteSummary
+from note.services import JsonNoteManager
 
 
 def test_create_note(manager: INoteManager): # It will run the test on each manager(in-memory, json, sql, etc.)
@@ -92,3 +95,187 @@ def test_find_note_by_prefix_unique_and_not_found(manager: INoteManager):
 # This test!
 # def test_find_note_by_prefix_NotUnique(manager: INoteManager)
 # We can not create two Note instance with same prefix it to test! This is why we use uuid :)
+
+def test_list_note_summaries(manager: INoteManager):
+    """Tests that display summaries are precomputed and kept in sync with writes."""
+    note = manager.create_note("Long Note", "first line\nsecond line " + "word " * 20)
+    summary = manager.list_note_summaries()[0]
+    assert summary.id == note.id
+    assert "\n" not in summary.snippet
+    assert summary.snippet.startswith("first line second line")
+    assert summary.snippet.endswith("...")
+    assert summary.updated == note.updated_at.strftime("%Y-%m-%d %H:%M")
+
+    manager.update_note(note.id, "Short Note", "short")
+    summary = manager.list_note_summaries()[0]
+    assert summary.title == "Short Note"
+    assert summary.snippet == "short"
+
+    manager.delete_note(note.id)
+    assert manager.list_note_summaries() == []
+
+def test_json_manager_summaries_after_reload(json_manager):
+    """Tests that summaries are built on first use after loading(not on load) and follow writes after that."""
+    note = json_manager.create_note("Saved", "Saved content")
+    with patch("note.services.NoteSummary.from_note", wraps=NoteSummary.from_note) as summarized:
+        reloaded = JsonNoteManager(db_path=json_manager._db_path)
+        reloaded.update_note(note.id, "Saved", "Changed content")
+        assert summarized.call_count == 0
+        summaries = reloaded.list_note_summaries()
+    assert [summary.id for summary in summaries] == [note.id]
+    assert summaries[0].snippet == "Changed content"
+
+    other = reloaded.create_note("Other", "...")
+    reloaded.delete_note(note.id)
+    assert [summary.id for summary in reloaded.list_note_summaries()] == [other.id]
+
+def test_filter_notes_by_tags_and_metadata(manager: INoteManager):
+    """Tests filtering by tags(intersection) and metadata."""
+    both = manager.create_note("Both", "...", tags=["Work", "home"], metadata={"prio": "1"})
+    work = manager.create_note("Work", "...", tags=["work"])
+    manager.create_note("Untagged", "...")
+
+    assert {note.id for note in manager.filter_notes(tags=["work"])} == {both.id, work.id}
+    assert [note.id for note in manager.filter_notes(tags=["work", "HOME"])] == [both.id]
+    assert [note.id for note in manager.filter_notes(metadata={"prio": "1"})] == [both.id]
+    assert manager.filter_notes(tags=["unknown"]) == []
+    assert manager.count_tags() == {"home": 1, "work": 2}
+    assert manager.count_tags([work.id]) == {"work": 1}
+
+def test_filter_notes_by_time_range(manager: INoteManager):
+    """Tests filtering by created_at and updated_at ranges."""
+    old = manager.create_note("Old", "...")
+    new = manager.create_note("New", "...")
+
+    assert [note.id for note in manager.filter_notes(since=new.created_at)] == [new.id]
+    assert [note.id for note in manager.filter_notes(until=new.created_at)] == [old.id]
+    naive_yesterday = (old.created_at - timedelta(days=1)).replace(tzinfo=None) # treated as UTC
+    assert len(manager.filter_notes(since=naive_yesterday)) == 2
+
+    manager.update_note(old.id, "Old", "changed")
+    assert [note.id for note in manager.filter_notes(time_field="updated_at")] == [new.id, old.id]
+    with pytest.raises(ValueError):
+        manager.filter_notes(time_field="title")
+
+def test_put_notes_with_naive_times(manager: INoteManager):
+    """Tests that naive times(e.g. from a hand-edited file or another store) are taken as UTC, not a TypeError."""
+    manager.create_note("Aware", "...")
+    naive = Note(title="Naive", content="...", created_at="2026-01-01T00:00:00", updated_at="2026-01-02T00:00:00")
+    assert naive.created_at == datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    manager.put_notes([naive])
+    assert len(manager.filter_notes()) == len(manager.list_all_notes()) == 2
+    assert [n.id for n in manager.filter_notes(until=datetime(2026, 6, 1, tzinfo=timezone.utc))] == [naive.id]
+
+def test_list_filtered_summaries(manager: INoteManager):
+    """Tests that list pages get summaries and tag counts of the filtered notes(or all notes) in one call."""
+    work = manager.create_note("Work", "...", tags=["work", "urgent"])
+    manager.create_note("Home", "...", tags=["home"])
+
+    summaries, tag_counts = manager.list_filtered_summaries(tags=["work"])
+    assert [summary.id for summary in summaries] == [work.id]
+    assert tag_counts == {"work": 1, "urgent": 1}
+    summaries, tag_counts = manager.list_filtered_summaries()
+    assert len(summaries) == 2
+    assert tag_counts == {"work": 1, "urgent": 1, "home": 1}
+
+def test_indexes_follow_updates_and_deletes(manager: INoteManager):
+    """Tests that indexes are updated on every mutation."""
+    note = manager.create_note("Tagged", "...", tags=["a"], metadata={"k": "v"})
+
+    manager.update_note(note.id, "Tagged", "...") # tags and metadata are kept
+    assert [n.id for n in manager.filter_notes(tags=["a"], metadata={"k": "v"})] == [note.id]
+
+    manager.update_note(note.id, "Tagged", "...", tags=["b"], metadata={})
+    assert manager.filter_notes(tags=["a"]) == []
+    assert manager.filter_notes(metadata={"k": "v"}) == []
+    assert [n.id for n in manager.filter_notes(tags=["b"])] == [note.id]
+
+    manager.delete_note(note.id)
+    assert manager.filter_notes(tags=["b"]) == []
+    assert manager.filter_notes() == []
+    assert manager.count_tags() == {}
+
+def test_json_manager_persists_tags(json_manager):
+    """Tests that tags and metadata are saved and indexed again after reload."""
+    note = json_manager.create_note("Saved", "...", tags=["work"], metadata={"project": "note"})
+    reloaded = JsonNoteManager(db_path=json_manager._db_path)
+    assert reloaded.get_note_by_id(note.id).metadata == {"project": "note"}
+    assert [n.id for n in reloaded.filter_notes(tags=["work"])] == [note.id]
+
+def test_json_manager_keeps_tombstones(json_manager):
+    """Tests that deleted notes are saved as tombstones(for sync) but never listed."""
+    note = json_manager.create_note("Deleted", "...")
+    json_manager.delete_note(note.id)
+    reloaded = JsonNoteManager(db_path=json_manager._db_path)
+    assert reloaded.list_all_notes() == []
+    assert reloaded.get_note_by_id(note.id) is None
+    assert reloaded.delete_note(note.id) is False
+    [tombstone] = reloaded.get_notes_for_sync([note.id])
+    assert tombstone.deleted_at is not None
+    assert reloaded.get_merkle_tree().root_hash == json_manager.get_merkle_tree().root_hash
+
+def test_json_managers_sharing_a_file(json_manager):
+    """Tests that a manager doesn't overwrite notes another manager saved after it loaded the file."""
+    other = JsonNoteManager(db_path=json_manager._db_path)
+    first = json_manager.create_note("First", "...")
+    second = other.create_note("Second", "...")
+    other.delete_note(second.id)
+    third = json_manager.create_note("Third", "...")
+    reloaded = JsonNoteManager(db_path=json_manager._db_path)
+    assert {note.id for note in reloaded.list_all_notes()} == {first.id, third.id}
+    assert [note.id for note in reloaded.get_notes_for_sync([second.id])] == [second.id] # tombstone
+
+def test_json_manager_hashes_notes_only_for_sync(json_manager):
+    """Tests that loading doesn't hash notes, the Merkle tree is built on first use and then updated per write."""
+    notes = [json_manager.create_note(f"Note {i}", "...") for i in range(5)]
+    with patch("note.services.note_hash", wraps=note_hash) as hashed:
+        reloaded = JsonNoteManager(db_path=json_manager._db_path)
+        reloaded.update_note(notes[0].id, "Changed", "...")
+        assert hashed.call_count == 0
+
+        reloaded.get_merkle_tree()
+        reloaded.delete_note(notes[1].id)
+        assert hashed.call_count == 5 + 1 # every note once, then only the tombstone
+    fresh = JsonNoteManager(db_path=json_manager._db_path)
+    assert reloaded.get_merkle_tree().root_hash == fresh.get_merkle_tree().root_hash
+
+def test_json_manager_never_saves_over_a_broken_file(json_manager):
+    """Tests that a file which can't be parsed on merge is an error, not an empty store to write our notes over."""
+    for i in range(10):
+        json_manager.create_note(f"Note {i}", "...")
+    db_path = json_manager._db_path
+    content = db_path.read_text()
+    db_path.write_text(content[: len(content) // 2]) # like a half-written file of another program
+
+    with patch("note.services.time.sleep"), pytest.raises(StorageError):
+        json_manager.create_note("New", "...")
+    assert db_path.read_text() == content[: len(content) // 2]
+
+    db_path.write_text(content) # the other program finished its write
+    json_manager.create_note("New", "...")
+    assert len(JsonNoteManager(db_path=db_path).list_all_notes()) == 12 # the first "New" was kept in memory, saved now
+    assert [path.name for path in db_path.parent.iterdir()] == [db_path.name] # no temp files left
+
+def test_json_manager_time_index_after_reload(json_manager):
+    """Tests that the bulk-built time index(one sort on load) is ordered and still takes single inserts."""
+    notes = [json_manager.create_note(f"Note {i}", "...") for i in range(5)]
+    reloaded = JsonNoteManager(db_path=json_manager._db_path)
+    assert [n.id for n in reloaded.filter_notes()] == [note.id for note in notes]
+    assert [n.id for n in reloaded.filter_notes(since=notes[3].created_at)] == [notes[3].id, notes[4].id]
+
+    newest = reloaded.create_note("Newest", "...")
+    reloaded.update_note(notes[0].id, "Changed", "...")
+    assert [n.id for n in reloaded.filter_notes(time_field="updated_at")][-2:] == [newest.id, notes[0].id]
+
+def test_add_attachment(manager: INoteManager):
+    """Tests that attachments are added once per content and note timestamps are updated."""
+    note = manager.create_note("With file", "...")
+    original_updated_at = note.updated_at
+    attachment = Attachment(filename="a.txt", digest="a" * 64, size=3, content_type="text/plain")
+
+    manager.add_attachment(note.id, attachment)
+    updated_note = manager.add_attachment(note.id, attachment.model_copy(update={"filename": "b.txt"}))
+    assert [item.filename for item in updated_note.attachments] == ["b.txt"]
+    assert updated_note.updated_at > original_updated_at
+    assert manager.add_attachment(uuid.uuid4(), attachment) is None
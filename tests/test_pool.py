@@ -0,0 +1,86 @@
+from pathlib import Path
+
+import pytest
+
+from note.exceptions import NotebookNotFoundError
+from note.pool import NotebookPool, list_notebooks
+from note.services import JsonNoteManager
+
+
+def test_pool_evicts_least_recently_used(tmp_path: Path):
+    """Only `max_open` notebooks stay loaded, the least recently used one is closed first."""
+    pool = NotebookPool(tmp_path, max_open=2)
+    pool.get("a", create=True)
+    pool.get("b", create=True)
+    pool.get("a") # "b" is the least recently used now
+    pool.get("c", create=True)
+    assert pool.open_notebooks() == ["a", "c"]
+    assert list_notebooks(tmp_path) == ["a", "b", "c"]
+
+def test_pool_flushes_on_eviction(tmp_path: Path):
+    """Without autosave, changes are written when a notebook is closed."""
+    pool = NotebookPool(tmp_path, max_open=1, autosave=False)
+    note = pool.get("work", create=True).create_note("Unsaved", "...")
+    assert JsonNoteManager(tmp_path / "work.json").get_note_by_id(note.id) is None
+
+    pool.get("home", create=True) # closes "work"
+    assert JsonNoteManager(tmp_path / "work.json").get_note_by_id(note.id) is not None
+
+def test_pool_byte_budget(tmp_path: Path):
+    """Notebooks are closed when their files are bigger than the budget in total."""
+    pool = NotebookPool(tmp_path, max_open=10, max_bytes=1000)
+    pool.get("big", create=True).create_note("Big", "x" * 2000)
+    pool.get("small", create=True)
+    assert pool.open_notebooks() == ["small"]
+    pool.get("big") # the newest notebook always stays open
+    assert pool.open_notebooks() == ["big"]
+
+def test_pool_reloads_changed_files(tmp_path: Path):
+    """Changes made by another process(like CLI) are visible on the next `get`."""
+    pool = NotebookPool(tmp_path)
+    pool.get("work", create=True)
+    note = JsonNoteManager(tmp_path / "work.json").create_note("From CLI", "...")
+    assert pool.get("work").get_note_by_id(note.id) is not None
+
+def test_invalid_notebook_name(tmp_path: Path):
+    """Notebook names can't point outside of the notebooks directory."""
+    with pytest.raises(ValueError):
+        NotebookPool(tmp_path).get("../secret")
+
+def test_pool_keeps_acquired_notebooks_open(tmp_path: Path):
+    """A notebook in use is not closed, so writes made after other notebooks were opened are still saved."""
+    pool = NotebookPool(tmp_path, max_open=1, autosave=False)
+    work = pool.acquire("work", create=True)
+    pool.get("home", create=True) # over budget, but "work" is in use
+    assert pool.open_notebooks() == ["work", "home"]
+
+    note = work.create_note("Late write", "...")
+    pool.release("work")
+    pool.get("other", create=True) # now "work" can be closed, and it is flushed
+    assert "work" not in pool.open_notebooks()
+    assert JsonNoteManager(tmp_path / "work.json").get_note_by_id(note.id) is not None
+
+def test_pool_flush_keeps_changes_of_others(tmp_path: Path):
+    """Unsaved notes are merged with notes someone else saved meanwhile, instead of overwriting them."""
+    pool = NotebookPool(tmp_path, autosave=False)
+    ours = pool.get("work", create=True).create_note("From web", "...")
+    theirs = JsonNoteManager(tmp_path / "work.json").create_note("From CLI", "...")
+
+    manager = pool.get("work") # reloads the file and keeps our unsaved note
+    assert manager.get_note_by_id(theirs.id) is not None
+    assert manager.get_note_by_id(ours.id) is not None
+
+    late = JsonNoteManager(tmp_path / "work.json").create_note("Also from CLI", "...")
+    pool.close() # flush without a reload first
+    saved = JsonNoteManager(tmp_path / "work.json")
+    assert {note.id for note in saved.list_all_notes()} == {ours.id, theirs.id, late.id}
+
+def test_reading_missing_notebook(tmp_path: Path):
+    """Only writes create notebooks, a typo in a notebook name doesn't leave a file behind."""
+    pool = NotebookPool(tmp_path)
+    with pytest.raises(NotebookNotFoundError):
+        pool.get("typo")
+    with pytest.raises(NotebookNotFoundError):
+        pool.acquire("typo")
+    assert list_notebooks(tmp_path) == []
+    assert pool.open_notebooks() == []
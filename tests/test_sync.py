@@ -0,0 +1,109 @@
+from pathlib import Path
+
+import pytest
+
+from note.exceptions import SyncError
+from note.merkle import MerkleTree, note_hash
+from note.services import InMemoryNoteManager, JsonNoteManager
+from note.sync import LocalPeer, local_wins, open_peer, sync_stores
+
+
+def test_merkle_root_depends_only_on_content():
+    """Two trees with the same notes have the same root hash, whatever the insertion order."""
+    manager = InMemoryNoteManager()
+    notes = [manager.create_note(f"Title {i}", "...") for i in range(5)]
+    first, second = MerkleTree(), MerkleTree()
+    for note in notes:
+        first.add(note.id, note_hash(note))
+    for note in reversed(notes):
+        second.add(note.id, note_hash(note))
+    assert first.root_hash == second.root_hash == manager.get_merkle_tree().root_hash
+
+    second.remove(notes[0].id)
+    assert first.root_hash != second.root_hash
+    bucket = str(notes[0].id)[:2]
+    assert str(notes[0].id) in first.children(bucket)
+    assert str(notes[0].id) not in second.children(bucket)
+
+def test_sync_copies_missing_notes_both_ways():
+    """Notes which exist only in one store are copied to the other one."""
+    local, remote = InMemoryNoteManager(), InMemoryNoteManager()
+    local_note = local.create_note("Local", "...", tags=["work"])
+    remote_note = remote.create_note("Remote", "...")
+
+    report = sync_stores(local, LocalPeer(remote))
+    assert (report.pulled, report.pushed, report.conflicts) == (1, 1, 0)
+    assert local.get_note_by_id(remote_note.id).title == "Remote"
+    assert [note.id for note in remote.filter_notes(tags=["work"])] == [local_note.id] # indexed on arrival
+    assert local.get_merkle_tree().root_hash == remote.get_merkle_tree().root_hash
+
+    # Nothing left to do: only the root hashes are compared.
+    report = sync_stores(local, LocalPeer(remote))
+    assert (report.pulled, report.pushed, report.round_trips) == (0, 0, 1)
+
+def test_sync_transfers_only_changed_notes():
+    """After an edit, only that note is transferred and newest version wins."""
+    local, remote = InMemoryNoteManager(), InMemoryNoteManager()
+    for i in range(50):
+        local.create_note(f"Note {i}", "...")
+    sync_stores(local, LocalPeer(remote))
+
+    edited = local.list_all_notes()[7]
+    remote.update_note(edited.id, "Old edit", "...")
+    local.update_note(edited.id, "New edit", "...")
+
+    report = sync_stores(local, LocalPeer(remote))
+    assert (report.pulled, report.pushed, report.conflicts) == (0, 1, 1)
+    assert remote.get_note_by_id(edited.id).title == "New edit"
+    assert local.get_merkle_tree().root_hash == remote.get_merkle_tree().root_hash
+
+def test_sync_with_custom_policy():
+    """A conflict policy can choose another version than the newest one."""
+    local, remote = InMemoryNoteManager(), InMemoryNoteManager()
+    note = local.create_note("Original", "...")
+    sync_stores(local, LocalPeer(remote))
+    remote.update_note(note.id, "Remote edit", "...")
+
+    report = sync_stores(local, LocalPeer(remote), policy=local_wins)
+    assert (report.pulled, report.pushed) == (0, 1)
+    assert remote.get_note_by_id(note.id).title == "Original"
+
+def test_sync_propagates_deletions():
+    """A deleted note is removed from the other store too, instead of being copied back."""
+    local, remote = InMemoryNoteManager(), InMemoryNoteManager()
+    kept = local.create_note("Kept", "...")
+    deleted = local.create_note("Deleted", "...", tags=["work"])
+    sync_stores(local, LocalPeer(remote))
+
+    local.delete_note(deleted.id)
+    report = sync_stores(local, LocalPeer(remote))
+    assert (report.pulled, report.pushed) == (0, 1)
+    assert local.get_note_by_id(deleted.id) is None
+    assert remote.get_note_by_id(deleted.id) is None
+    assert remote.filter_notes(tags=["work"]) == []
+    assert [note.id for note in remote.list_all_notes()] == [kept.id]
+    assert local.get_merkle_tree().root_hash == remote.get_merkle_tree().root_hash
+
+def test_sync_newer_edit_wins_over_deletion():
+    """With the default policy, a note edited after it was deleted elsewhere comes back."""
+    local, remote = InMemoryNoteManager(), InMemoryNoteManager()
+    note = local.create_note("Original", "...")
+    sync_stores(local, LocalPeer(remote))
+
+    local.delete_note(note.id)
+    remote.update_note(note.id, "Edited later", "...")
+    report = sync_stores(local, LocalPeer(remote))
+    assert report.conflicts == 1
+    assert local.get_note_by_id(note.id).title == "Edited later"
+    assert local.get_merkle_tree().root_hash == remote.get_merkle_tree().root_hash
+
+def test_open_peer_needs_an_existing_file(tmp_path: Path):
+    """A mistyped peer path is an error, not a new empty store which gets every note."""
+    with pytest.raises(SyncError):
+        open_peer(str(tmp_path / "other.jsn"))
+    with pytest.raises(SyncError):
+        open_peer(str(tmp_path / "missing" / "other.json"))
+    assert list(tmp_path.iterdir()) == []
+
+    JsonNoteManager(tmp_path / "other.json").create_note("Remote", "...")
+    assert open_peer(str(tmp_path / "other.json")).root_hash() != InMemoryNoteManager().get_merkle_tree().root_hash
@@ -0,0 +1,20 @@
+import pytest
+from jinja2 import Environment
+
+from note.utils import make_snippet
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "short",
+    "line one\nline two",
+    "a" * 54,
+    "a" * 56,
+    "word " * 30,
+    "first line\nsecond line with some more words to truncate here",
+])
+def test_make_snippet_matches_jinja_filters(text: str):
+    """The precomputed snippet should be the same as the old template filters."""
+    env = Environment(autoescape=False)  # noqa: S701 (plain text, like the old template output before escaping)
+    expected = env.from_string("{{ text | replace('\\n', ' ') | truncate(50) }}").render(text=text)
+    assert make_snippet(text) == expected
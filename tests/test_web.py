@@ -0,0 +1,172 @@
+import asyncio
+from pathlib import Path
+from typing import Any, List, Optional
+from unittest.mock import patch
+
+import pytest
+
+pytest.importorskip("httpx") # TestClient needs it
+
+from fastapi.testclient import TestClient
+
+from note import web_app
+from note.merkle import note_hash
+from note.services import InMemoryNoteManager, JsonNoteManager
+from note.sync import HttpPeer, sync_stores
+from note.utils import STREAM_CHUNK_SIZE
+from settings import StorageType, settings
+
+
+@pytest.fixture
+def app(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    """Web app working on files in tmp_path."""
+    monkeypatch.setattr(settings, "STORAGE_TYPE", StorageType.JSON)
+    monkeypatch.setattr(settings, "DB_PATH", tmp_path / "notes.json")
+    monkeypatch.setattr(settings, "BLOBS_PATH", tmp_path / "blobs")
+    monkeypatch.setattr(settings, "NOTEBOOKS_PATH", tmp_path / "notebooks")
+    web_app.get_singleton_manager.cache_clear()
+    web_app.get_notebook_pool.cache_clear()
+    yield web_app.create_app()
+    web_app.get_singleton_manager.cache_clear()
+    web_app.get_notebook_pool.cache_clear()
+
+@pytest.fixture
+def client(app):
+    """Test client of the web app."""
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def _response_bodies(app, path: str) -> List[bytes]:
+    """Calls the ASGI app directly and returns the body of each `http.response.body` message it sent."""
+    bodies: List[bytes] = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            bodies.append(message.get("body", b""))
+
+    scope = {
+        # spec 2.4: Starlette does not listen for disconnects while streaming, so `receive` is never awaited again
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "method": "GET", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": b"", "headers": [], "http_version": "1.1", "scheme": "http",
+        "server": ("testserver", 80), "client": ("testclient", 50000),
+    }
+    asyncio.run(app(scope, receive, send))
+    return bodies
+
+
+def test_list_page_is_sent_in_few_chunks(app, tmp_path: Path):
+    """Template pieces are grouped, so a big page is not sent as thousands of tiny chunks."""
+    manager = JsonNoteManager(tmp_path / "notes.json", autosave=False)
+    for i in range(500):
+        manager.create_note(f"Note {i}", "Some content " * 5)
+    manager.flush()
+
+    bodies = _response_bodies(app, "/notes")
+    page = b"".join(bodies)
+    assert page.count(b'class="note-title"') == 500
+    assert len(bodies) <= len(page) // STREAM_CHUNK_SIZE + 2 # +1 for the rest, +1 for the closing message
+
+def test_default_store_is_cached_between_requests(client: TestClient, tmp_path: Path):
+    """The Json manager is loaded once, and again only when someone else changes the file."""
+    client.post("/notes/create", data={"title": "From web", "content": "..."})
+    with patch.object(JsonNoteManager, "_read_file") as read_file:
+        assert "From web" in client.get("/notes").text
+    read_file.assert_not_called()
+
+    JsonNoteManager(tmp_path / "notes.json").create_note("From CLI", "...")
+    assert "From CLI" in client.get("/notes").text
+
+def test_list_filter_form_with_empty_dates(client: TestClient, tmp_path: Path):
+    """The filter form always sends both date inputs, empty ones mean no filter."""
+    manager = JsonNoteManager(tmp_path / "notes.json")
+    manager.create_note("Work note", "...", tags=["work"])
+    manager.create_note("Home note", "...", tags=["home"])
+
+    response = client.get("/notes?tag=work&since=&until=")
+    assert response.status_code == 200
+    assert "Work note" in response.text
+    assert "Home note" not in response.text
+
+    assert "Work note" not in client.get("/notes?since=2999-01-01&until=").text
+    assert client.get("/notes?since=yesterday").status_code == 422
+
+
+class _TestClientPeer(HttpPeer):
+    """HttpPeer which sends its requests through TestClient instead of the network."""
+
+    def __init__(self, client: TestClient, prefix: str = "") -> None:
+        super().__init__("http://testserver" + prefix)
+        self._client = client
+        self._prefix = prefix # e.g. /nb/work
+
+    def _request(self, method: str, path: str, payload: Optional[Any] = None) -> Any:
+        response = self._client.request(method, self._prefix + path, json=payload)
+        response.raise_for_status()
+        return response.json()
+
+def test_sync_routes_cost_scales_with_changes(client: TestClient):
+    """The server keeps its Merkle tree between requests, so a sync of one change hashes only that note."""
+    server = web_app.get_singleton_manager()
+    local = InMemoryNoteManager()
+    for i in range(200):
+        local.create_note(f"Note {i}", "...")
+    sync_stores(local, _TestClientPeer(client))
+    assert len(server.list_all_notes()) == 200
+
+    local.update_note(local.list_all_notes()[3].id, "Changed", "...")
+    with patch("note.services.note_hash", wraps=note_hash) as hashed:
+        report = sync_stores(local, _TestClientPeer(client))
+    assert report.pushed == 1
+    assert hashed.call_count == 1 # only the stored note, not the whole notes.json again
+    assert server.get_merkle_tree().root_hash == local.get_merkle_tree().root_hash
+
+def test_upload_is_streamed_to_blob_store(client: TestClient, tmp_path: Path):
+    """Uploads skip Starlette's spooled form parsing and are written once, straight to the blob store."""
+    note = JsonNoteManager(tmp_path / "notes.json").create_note("With file", "...")
+    content = b"attachment data " * 10_000
+
+    with patch("starlette.formparsers.MultiPartParser.parse") as form_parser:
+        response = client.post(
+            f"/notes/{note.id}/attachments",
+            files={"file": ("data.txt", content, "text/plain")},
+            follow_redirects=False,
+        )
+    assert response.status_code == 303
+    form_parser.assert_not_called()
+
+    [attachment] = web_app.get_singleton_manager().get_note_by_id(note.id).attachments
+    assert (attachment.filename, attachment.size, attachment.content_type) == ("data.txt", len(content), "text/plain")
+    assert client.get(f"/notes/{note.id}/attachments/{attachment.digest}").content == content
+    assert list((tmp_path / "blobs" / "tmp").iterdir()) == [] # nothing left behind
+
+    bad = client.post(f"/notes/{note.id}/attachments", data={"title": "no file"}, files={"other": ("x", b"x")})
+    assert bad.status_code == 400
+
+    with patch.object(JsonNoteManager, "add_attachment", return_value=None): # deleted during the upload
+        gone = client.post(f"/notes/{note.id}/attachments", files={"file": ("x", b"x")}, follow_redirects=False)
+    assert gone.status_code == 404
+
+def test_notebook_routes(client: TestClient, tmp_path: Path):
+    """Notebooks are created by the first note, reading a missing one is 404 and creates nothing."""
+    assert client.get("/nb/typo/notes").status_code == 404
+    assert client.get("/nb/typo/sync/root").json() == {"root_hash": InMemoryNoteManager().get_merkle_tree().root_hash}
+    assert not (tmp_path / "notebooks" / "typo.json").exists()
+
+    client.post("/nb/work/notes/create", data={"title": "Work note", "content": "..."})
+    assert "Work note" in client.get("/nb/work/notes").text
+    assert "Work note" not in client.get("/notes").text
+    assert web_app.get_notebook_pool().open_notebooks() == ["work"]
+
+def test_sync_into_a_new_notebook(client: TestClient, tmp_path: Path):
+    """A missing notebook syncs like an empty store, and the push creates it."""
+    local = InMemoryNoteManager()
+    note = local.create_note("Synced", "...")
+
+    report = sync_stores(local, _TestClientPeer(client, "/nb/fresh"))
+    assert report.pushed == 1
+    assert (tmp_path / "notebooks" / "fresh.json").exists()
+    assert "Synced" in client.get(f"/nb/fresh/notes/{note.id}").text